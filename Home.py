@@ -1,5 +1,6 @@
 import pandas as pd
 import streamlit as st
+from utils.utils_orthography import MOORE_ALPHABET
 
 st.set_page_config(
     page_title="MooreFrCollection",
@@ -45,6 +46,5 @@ st.markdown("""
     Voici l'alphabet mooré attendu :
 """)
 
-alphabet = ["a", "ã", "b", "d", "e", "ẽ", "ɛ", "f", "g", "h", "i", "ĩ", "ɩ", "k", "l", "m", "n", "o", "õ", "p", "r", "s", "t", "u", "ũ", "ʋ", "v", "w", "y", "z"]
-st.write(", ".join(alphabet))
+st.write(", ".join(MOORE_ALPHABET))
 
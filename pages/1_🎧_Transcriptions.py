@@ -2,7 +2,8 @@ import streamlit as st
 from urllib.parse import unquote
 import os
 import json
-from utils.utils_trad import get_total_audio_duration_by_user, list_audio_files_by_title, get_processed_audio_files_by_user_and_title, get_audio_url, save_annotation
+from utils.utils_trad import get_total_audio_duration_by_user, list_audio_files_by_title, get_processed_audio_files_by_user_and_title, get_audio_url, save_annotation, OrthographyWarning, start_annotation_worker, WRITE_BEHIND, load_title_metadata
+from utils.utils_storage import storage, STORAGE_BACKEND
 from dotenv import load_dotenv
 
 load_dotenv(".env")
@@ -12,41 +13,33 @@ AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL_S3")
 ANNOTATIONS_PREFIX = "annotations"
+# En dessous de cette proportion de parole estimée, un segment est considéré comme silence ou musique
+MIN_SPEECH_RATIO = float(os.getenv("MIN_SPEECH_RATIO", "0.2"))
 
-import s3fs
+STATUS_FILE = "title_completion_status.json"
 
-access_key = os.getenv("AWS_ACCESS_KEY_ID")
-secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-endpoint_url = os.getenv("AWS_ENDPOINT_URL_S3")
-
-fs = s3fs.S3FileSystem(
-    key=AWS_ACCESS_KEY_ID,
-    secret=AWS_SECRET_ACCESS_KEY,
-    endpoint_url=ENDPOINT_URL)
-
-
-if not all([S3_BUCKET, S3_PREFIX, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, ENDPOINT_URL]):
+# Les variables S3 ne sont nécessaires que si le stockage passe par S3
+if STORAGE_BACKEND != "local" and not all([S3_BUCKET, S3_PREFIX, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, ENDPOINT_URL]):
     st.error("Veuillez configurer correctement les variables d'environnement S3.")
     st.stop()
 
+# Envoyer vers le stockage les annotations restées dans le journal local
+if WRITE_BEHIND:
+    start_annotation_worker()
+
 # Fonction pour vérifier les titres complètement traités
 def get_completed_titles():
     """Renvoie la liste des titres qui n'ont plus d'audios à traiter."""
-    status_file = "title_completion_status.json"
-    
-    if os.path.exists(status_file):
-        with open(status_file, 'r') as f:
-            status = json.load(f)
+    if storage.exists(STATUS_FILE):
+        status = json.loads(storage.get_bytes(STATUS_FILE).decode("utf-8"))
         return [title for title, is_completed in status.items() if is_completed]
     else:
         return []
 
 def save_title_completion_status(title, is_completed):
     """Sauvegarde l'état de traitement d'un titre dans un fichier JSON."""
-    status_file = "title_completion_status.json"
-    
-    with fs.open(status_file, 'r') as f:
-        status = json.load(f)
+    if storage.exists(STATUS_FILE):
+        status = json.loads(storage.get_bytes(STATUS_FILE).decode("utf-8"))
     else:
         status = {}
     
@@ -54,8 +47,7 @@ def save_title_completion_status(title, is_completed):
     status[title] = is_completed
     
     # Sauvegarder
-    with fs.open(status_file, 'w') as f:
-        json.dump(status, f)
+    storage.put_bytes(STATUS_FILE, json.dumps(status).encode("utf-8"), content_type="application/json")
 
 st.set_page_config(page_title="Travaux Audio", layout="wide")
 st.title("🗣️ Travaux Audio - Transcription & Traduction")
@@ -136,6 +128,15 @@ processed_files = get_processed_audio_files_by_user_and_title(username, selected
 # Filtrer la liste des audios pour ne garder que ceux non traités
 unprocessed_audio_paths = [path for path in audio_paths if os.path.basename(path) not in processed_files]
 
+# Écarter les segments sans parole (silence, musique) d'après les métadonnées du pipeline
+if st.checkbox("🔇 Masquer les audios sans parole", value=True) and unprocessed_audio_paths:
+    # Un seul fichier de métadonnées par titre
+    title_metadata = load_title_metadata(unprocessed_audio_paths[0].rsplit("/", 1)[0])
+    unprocessed_audio_paths = [
+        path for path in unprocessed_audio_paths
+        if title_metadata.get(os.path.basename(path), {}).get("speech_ratio", 1.0) >= MIN_SPEECH_RATIO
+    ]
+
 if not unprocessed_audio_paths:
     st.success(f"🎉 Vous avez déjà terminé tous les audios du groupe '{selected_title}'!")
     st.session_state.completed_titles.add(selected_title)
@@ -146,7 +147,7 @@ if not unprocessed_audio_paths:
     for audio_path in audio_paths:
         audio_filename = os.path.basename(audio_path)
         annotation_path = f"{ANNOTATIONS_PREFIX}/{selected_title}/{audio_filename}.json"
-        if not os.path.exists(annotation_path):
+        if not storage.exists(annotation_path):
             all_files_processed = False
             break
     
@@ -174,36 +175,47 @@ if unprocessed_audio_paths:
     with st.form(f"form_{current_audio}"):
         transcription = st.text_area("Transcription en mooré", key=f"tr_{current_audio}")
         traduction = st.text_area("Traduction en français", key=f"trad_{current_audio}")
+        confirmed = st.checkbox(
+            "Confirmer les caractères hors alphabet mooré (noms propres, emprunts)",
+            key=f"confirm_{current_audio}",
+        )
         submitted = st.form_submit_button("💾 Soumettre")
 
         if submitted:
-            save_annotation(
-                audio_path=current_audio,
-                user=username,
-                transcription=transcription,
-                traduction=traduction,
-            )
-            st.success("✅ Contribution enregistrée avec succès !")
-            st.session_state[index_key] += 1
-
-            # Vérifier si tous les audios non traités de ce groupe sont maintenant terminés
-            if st.session_state[index_key] >= len(unprocessed_audio_paths):
-                st.success(f"🎉 Vous avez terminé tous les audios du groupe '{selected_title}'!")
-                st.session_state.completed_titles.add(selected_title)
+            try:
+                save_annotation(
+                    audio_path=current_audio,
+                    user=username,
+                    transcription=transcription,
+                    traduction=traduction,
+                    confirmed=confirmed,
+                )
+            except OrthographyWarning as e:
+                st.warning(f"⚠️ {e}. Si c'est voulu, cochez la confirmation puis soumettez à nouveau.")
+            except ValueError as e:
+                st.error(f"❌ Transcription non conforme : {e}")
+            else:
+                st.success("✅ Contribution enregistrée avec succès !")
+                st.session_state[index_key] += 1
+
+                # Vérifier si tous les audios non traités de ce groupe sont maintenant terminés
+                if st.session_state[index_key] >= len(unprocessed_audio_paths):
+                    st.success(f"🎉 Vous avez terminé tous les audios du groupe '{selected_title}'!")
+                    st.session_state.completed_titles.add(selected_title)
                 
-                # Vérifier si ce titre est maintenant complètement traité par tous
-                all_files_processed = True
-                for audio_path in audio_paths:
-                    audio_filename = os.path.basename(audio_path)
-                    annotation_path = f"{ANNOTATIONS_PREFIX}/{selected_title}/{audio_filename}.json"
-                    if not os.path.exists(annotation_path):
-                        all_files_processed = False
-                        break
+                    # Vérifier si ce titre est maintenant complètement traité par tous
+                    all_files_processed = True
+                    for audio_path in audio_paths:
+                        audio_filename = os.path.basename(audio_path)
+                        annotation_path = f"{ANNOTATIONS_PREFIX}/{selected_title}/{audio_filename}.json"
+                        if not storage.exists(annotation_path):
+                            all_files_processed = False
+                            break
                 
-                if all_files_processed:
-                    save_title_completion_status(selected_title, True)
-            else:
-                st.rerun()
+                    if all_files_processed:
+                        save_title_completion_status(selected_title, True)
+                else:
+                    st.rerun()
     # Bouton pour continuer après avoir potentiellement terminé un groupe (hors du formulaire)
     if st.session_state[index_key] >= len(unprocessed_audio_paths) and st.button("Continuer avec un autre groupe"):
         st.rerun()
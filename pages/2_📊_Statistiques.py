@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from utils.utils_stats import (
-    load_all_annotations,
+    load_compacted_annotations,
     calculate_total_duration,
     calculate_contributor_ranking,
     create_contributions_histogram,
@@ -10,6 +10,25 @@ from utils.utils_stats import (
     calculate_contributions_over_time,
     calculate_average_annotation_length
 )
+from utils.utils_agreement import (
+    calculate_pairwise_agreement,
+    calculate_agreement_by_user,
+    calculate_agreement_by_title
+)
+from utils.utils_orthography import calculate_orthography_statistics
+
+# Durée pendant laquelle les annotations chargées sont réutilisées entre deux affichages
+ANNOTATIONS_CACHE_TTL = 300
+
+@st.cache_data(ttl=ANNOTATIONS_CACHE_TTL, show_spinner="Chargement des annotations...")
+def get_annotations():
+    """Charge les annotations compactées, mises en cache quelques minutes."""
+    return load_compacted_annotations()
+
+@st.cache_data(ttl=ANNOTATIONS_CACHE_TTL, show_spinner="Calcul de l'accord inter-annotateurs...")
+def get_pairwise_agreement():
+    """Accord par paire d'annotations, recalculé seulement quand les annotations sont rechargées."""
+    return calculate_pairwise_agreement(get_annotations())
 
 def display_most_recent_contributions(annotations, n=5):
     """Affiche les contributions les plus récentes."""
@@ -27,7 +46,7 @@ st.title("📊 Statistiques des Travaux Audio")
 st.markdown("Voici un aperçu des statistiques de contribution pour le projet **MooreFrCollection**.")
 
 # Charger toutes les annotations
-all_annotations = load_all_annotations()
+all_annotations = get_annotations()
 
 if all_annotations:
     # Première ligne : Métriques principales
@@ -85,5 +104,51 @@ if all_annotations:
     else:
         st.info("Aucune contribution à afficher pour l'évolution temporelle.")
 
+    st.markdown("---")
+
+    # Cinquième ligne : Accord entre annotateurs
+    st.subheader("🤝 Accord entre annotateurs (CER / WER)")
+    pairwise_df = get_pairwise_agreement()
+    if not pairwise_df.empty:
+        field = st.radio("Champ comparé", ["transcription", "traduction"], horizontal=True)
+        col_user, col_title = st.columns(2)
+        with col_user:
+            st.markdown("**Par contributeur**")
+            by_user = calculate_agreement_by_user(pairwise_df)
+            st.dataframe(by_user[by_user['field'] == field].drop(columns='field').set_index('user'), height=300)
+        with col_title:
+            st.markdown("**Par groupe audio**")
+            by_title = calculate_agreement_by_title(pairwise_df)
+            st.dataframe(by_title[by_title['field'] == field].drop(columns='field').set_index('title'), height=300)
+    else:
+        st.info("Aucun segment n'a encore été annoté par plusieurs contributeurs.")
+
+    st.markdown("---")
+
+    # Sixième ligne : Orthographe des transcriptions
+    st.subheader("🔤 Orthographe des transcriptions en mooré")
+    orthography_stats = calculate_orthography_statistics(all_annotations)
+    col_vocab, col_words, col_invalid = st.columns(3)
+    with col_vocab:
+        st.metric("📚 Taille du vocabulaire", orthography_stats["vocabulary_size"])
+    with col_words:
+        st.metric("📝 Nombre de mots", orthography_stats["total_words"])
+    with col_invalid:
+        st.metric("⚠️ Transcriptions hors alphabet", orthography_stats["invalid_texts"])
+
+    col_coverage, col_tags, col_chars = st.columns(3)
+    with col_coverage:
+        st.markdown("**Couverture de l'alphabet**")
+        st.dataframe(orthography_stats["coverage"].set_index("lettre"), height=300)
+    with col_tags:
+        st.markdown("**Fréquence des balises**")
+        st.dataframe(orthography_stats["tags"].set_index("balise"), height=300)
+    with col_chars:
+        st.markdown("**Caractères hors alphabet**")
+        if not orthography_stats["invalid_chars"].empty:
+            st.dataframe(orthography_stats["invalid_chars"].set_index("caractère"), height=300)
+        else:
+            st.success("Aucun caractère hors alphabet.")
+
 else:
     st.info("Aucune donnée d'annotation disponible pour générer les statistiques.")
\ No newline at end of file
@@ -0,0 +1,277 @@
+import os
+import json
+import numpy as np
+from loguru import logger
+from pydub import AudioSegment
+from profiler import profiler
+
+# Paramètres d'empreinte : audio ramené à 8 kHz mono, trames de 128 ms avec un pas de 32 ms.
+# Le recouvrement des trames rend l'empreinte robuste à un décalage de quelques échantillons
+# (intro de longueur différente sur une ré-upload).
+FINGERPRINT_SAMPLE_RATE = 8000
+FFT_SIZE = 1024
+HOP_SIZE = FFT_SIZE // 4
+# Bandes de fréquences (en bins FFT) dans lesquelles on cherche un pic par trame
+BAND_EDGES = [8, 24, 48, 96, 192, 384]
+PEAK_PERCENTILE = 90
+FAN_OUT = 3
+MAX_DELTA_FRAMES = 63
+# Hash trop fréquents (silences, jingles) ignorés lors de la recherche
+MAX_POSTINGS_PER_HASH = 2000
+
+# Seuils de détection des doublons. Sur des copies décalées d'un demi-pas et bruitées,
+# le ratio reste au-dessus de 0.29 ; entre épisodes différents il ne dépasse pas 0.01.
+MATCH_MIN_HASHES = 40
+MATCH_MIN_RATIO = 0.1
+
+
+def load_fingerprint_samples(filepath):
+    """Charge un fichier WAV en mono 8 kHz sous forme de tableau NumPy normalisé."""
+    audio = AudioSegment.from_wav(filepath).set_channels(1).set_frame_rate(FINGERPRINT_SAMPLE_RATE)
+    samples = np.asarray(audio.get_array_of_samples(), dtype=np.float32)
+    return samples / float(1 << (8 * audio.sample_width - 1))
+
+
+def compute_fingerprint(samples):
+    """
+    Calcule les hash d'empreinte audio d'un signal mono 8 kHz.
+
+    Les pics spectraux (un par bande et par trame, au-dessus d'un percentile de la bande)
+    sont appariés avec les pics suivants ; chaque paire (f1, f2, dt) est encodée sur 32 bits.
+
+    Returns:
+        Tableaux (hashes uint32, offsets uint32) — offset = trame du pic d'ancrage
+    """
+    empty = (np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint32))
+    if len(samples) < FFT_SIZE:
+        return empty
+
+    num_frames = 1 + (len(samples) - FFT_SIZE) // HOP_SIZE
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FFT_SIZE)[::HOP_SIZE][:num_frames]
+    spectrum = np.log1p(np.abs(np.fft.rfft(frames * np.hanning(FFT_SIZE).astype(np.float32), axis=1)))
+
+    peak_times, peak_freqs = [], []
+    for low, high in zip(BAND_EDGES[:-1], BAND_EDGES[1:]):
+        band = spectrum[:, low:high]
+        band_max = band.max(axis=1)
+        keep = np.nonzero(band_max > np.percentile(band_max, PEAK_PERCENTILE))[0]
+        peak_times.append(keep)
+        peak_freqs.append(band[keep].argmax(axis=1) + low)
+
+    times = np.concatenate(peak_times)
+    freqs = np.concatenate(peak_freqs)
+    order = np.lexsort((freqs, times))
+    times, freqs = times[order], freqs[order]
+
+    hashes, offsets = [], []
+    for k in range(1, FAN_OUT + 1):
+        dt = times[k:] - times[:-k]
+        valid = (dt > 0) & (dt <= MAX_DELTA_FRAMES)
+        anchor_freq = freqs[:-k][valid].astype(np.uint32)
+        target_freq = freqs[k:][valid].astype(np.uint32)
+        hashes.append((anchor_freq << 16) | (target_freq << 6) | dt[valid].astype(np.uint32))
+        offsets.append(times[:-k][valid].astype(np.uint32))
+
+    if not hashes:
+        return empty
+    return np.concatenate(hashes), np.concatenate(offsets)
+
+
+class FingerprintIndex:
+    """
+    Index inversé persistant des empreintes audio.
+
+    Les hash sont stockés triés dans des fichiers .npy chargés en mémoire mappée :
+    une recherche se résume à des `np.searchsorted`, indépendamment de la taille de l'index.
+
+    Un épisode n'est considéré comme traité (`title in index`) qu'une fois marqué terminé,
+    c'est-à-dire après l'upload de ses segments : un épisode dont le découpage ou l'upload
+    a échoué est repris à l'exécution suivante.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.episodes = []
+        self.completed = set()
+        self._run_titles = set()
+        self.hashes = np.empty(0, dtype=np.uint32)
+        self.episode_ids = np.empty(0, dtype=np.uint32)
+        self.offsets = np.empty(0, dtype=np.uint32)
+        self._pending = []
+        self._pending_sorted = None
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _load(self):
+        if not os.path.exists(self._path("episodes.json")):
+            return
+        with open(self._path("episodes.json"), "r", encoding="utf-8") as f:
+            self.episodes = json.load(f)
+        self.hashes = np.load(self._path("hashes.npy"), mmap_mode="r")
+        self.episode_ids = np.load(self._path("episode_ids.npy"), mmap_mode="r")
+        self.offsets = np.load(self._path("offsets.npy"), mmap_mode="r")
+        if os.path.exists(self._path("completed.json")):
+            with open(self._path("completed.json"), "r", encoding="utf-8") as f:
+                self.completed = set(json.load(f))
+        logger.info(f"Index d'empreintes chargé: {len(self.episodes)} épisodes, {len(self.hashes)} hash")
+
+    def __contains__(self, title):
+        return title in self.completed
+
+    def add(self, title, hashes, offsets):
+        """Ajoute un épisode à l'index (en mémoire jusqu'à l'appel de `save`)."""
+        self._run_titles.add(title)
+        if title in self.episodes:
+            # Empreinte déjà enregistrée lors d'une exécution précédente non terminée
+            return
+        episode_id = len(self.episodes)
+        self.episodes.append(title)
+        self._pending.append((hashes, np.full(len(hashes), episode_id, dtype=np.uint32), offsets))
+        self._pending_sorted = None
+
+    def _sorted_pending(self):
+        """Épisodes ajoutés depuis le chargement, triés à part (petit volume) pour la recherche."""
+        if self._pending_sorted is None:
+            hashes = np.concatenate([p[0] for p in self._pending])
+            order = np.argsort(hashes, kind="stable")
+            self._pending_sorted = (
+                hashes[order],
+                np.concatenate([p[1] for p in self._pending])[order],
+                np.concatenate([p[2] for p in self._pending])[order],
+            )
+        return self._pending_sorted
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+        pending_hashes, pending_ids, pending_offsets = self._sorted_pending()
+        hashes = np.concatenate([np.asarray(self.hashes), pending_hashes])
+        episode_ids = np.concatenate([np.asarray(self.episode_ids), pending_ids])
+        offsets = np.concatenate([np.asarray(self.offsets), pending_offsets])
+        order = np.argsort(hashes, kind="stable")
+        self.hashes, self.episode_ids, self.offsets = hashes[order], episode_ids[order], offsets[order]
+        self._pending = []
+        self._pending_sorted = None
+
+    def save(self):
+        """Écrit l'index sur disque."""
+        self._merge_pending()
+        os.makedirs(self.index_dir, exist_ok=True)
+        for name, array in (("hashes", self.hashes), ("episode_ids", self.episode_ids), ("offsets", self.offsets)):
+            tmp_path = self._path(f"{name}.tmp.npy")
+            np.save(tmp_path, np.asarray(array))
+            os.replace(tmp_path, self._path(f"{name}.npy"))
+        with open(self._path("episodes.json"), "w", encoding="utf-8") as f:
+            json.dump(self.episodes, f, ensure_ascii=False)
+
+    def mark_completed(self, titles):
+        """Marque des épisodes comme entièrement découpés et uploadés, et l'enregistre sur disque."""
+        self.completed.update(titles)
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_path = self._path("completed.tmp.json")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sorted(self.completed), f, ensure_ascii=False)
+        os.replace(tmp_path, self._path("completed.json"))
+
+    @staticmethod
+    def _lookup(sorted_hashes, episode_ids, stored_offsets, hashes, offsets):
+        """Renvoie (épisode, décalage temporel) de chaque correspondance dans un tableau trié."""
+        lo = np.searchsorted(sorted_hashes, hashes, side="left")
+        hi = np.searchsorted(sorted_hashes, hashes, side="right")
+        counts = hi - lo
+        counts[counts > MAX_POSTINGS_PER_HASH] = 0
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        # Développement vectorisé des listes de postings de chaque hash de la requête
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        positions = starts + np.arange(total)
+        query_offsets = np.repeat(offsets.astype(np.int64), counts)
+
+        matched_ids = np.asarray(episode_ids[positions], dtype=np.int64)
+        deltas = np.asarray(stored_offsets[positions], dtype=np.int64) - query_offsets
+        return matched_ids, deltas
+
+    def query(self, hashes, offsets, exclude=None):
+        """
+        Cherche l'épisode indexé qui recouvre le mieux l'empreinte donnée.
+
+        L'index sur disque et les épisodes ajoutés pendant l'exécution sont interrogés
+        séparément : un ajout ne déclenche jamais de nouveau tri de tout l'index.
+        Seuls les épisodes terminés ou retenus pendant cette exécution peuvent correspondre,
+        hormis `exclude` (l'épisode lui-même lorsqu'il est repris après un échec).
+
+        Returns:
+            (titre, nombre de hash alignés, ratio sur le nombre de hash de la requête),
+            ou (None, 0, 0.0) si aucune correspondance
+        """
+        if len(hashes) == 0:
+            return None, 0, 0.0
+
+        matches = [self._lookup(self.hashes, self.episode_ids, self.offsets, hashes, offsets)]
+        if self._pending:
+            matches.append(self._lookup(*self._sorted_pending(), hashes, offsets))
+        matched_ids = np.concatenate([m[0] for m in matches])
+        deltas = np.concatenate([m[1] for m in matches])
+
+        matchable = np.array([(t in self.completed or t in self._run_titles) and t != exclude
+                              for t in self.episodes], dtype=bool)
+        keep = matchable[matched_ids]
+        matched_ids, deltas = matched_ids[keep], deltas[keep]
+        if len(matched_ids) == 0:
+            return None, 0, 0.0
+
+        # Un doublon se traduit par de nombreux hash partageant le même décalage temporel
+        keys = matched_ids * (1 << 32) + (deltas + (1 << 31))
+        unique_keys, key_counts = np.unique(keys, return_counts=True)
+        best = key_counts.argmax()
+        best_count = int(key_counts[best])
+        title = self.episodes[int(unique_keys[best] >> 32)]
+        return title, best_count, best_count / len(hashes)
+
+
+def deduplicate_audio_files(input_dir, index_dir):
+    """
+    Compare les fichiers audio téléchargés à l'index d'empreintes et écarte les doublons.
+
+    Les fichiers nouveaux sont ajoutés à l'index ; ceux déjà traités ou recouvrant
+    fortement un épisode existant sont ignorés. Les épisodes retenus ne sont marqués
+    terminés qu'après l'upload de leurs segments (voir `FingerprintIndex.mark_completed`).
+
+    Args:
+        input_dir: Répertoire des fichiers audio téléchargés
+        index_dir: Répertoire de l'index d'empreintes persistant
+
+    Returns:
+        Liste des noms de fichiers WAV à segmenter
+    """
+    index = FingerprintIndex(index_dir)
+    wav_files = [f for f in os.listdir(input_dir) if f.endswith(".wav")]
+    new_files = []
+
+    with profiler.stage("deduplication") as stage:
+        for filename in wav_files:
+            title = os.path.splitext(filename)[0]
+            if title in index:
+                logger.info(f"Déjà traité, ignoré: {filename}")
+                continue
+            try:
+                filepath = os.path.join(input_dir, filename)
+                hashes, offsets = compute_fingerprint(load_fingerprint_samples(filepath))
+                stage.record(1, os.path.getsize(filepath))
+                match_title, match_count, match_ratio = index.query(hashes, offsets, exclude=title)
+                if match_count >= MATCH_MIN_HASHES and match_ratio >= MATCH_MIN_RATIO:
+                    logger.warning(f"Doublon détecté: {filename} ≈ {match_title} ({match_ratio:.0%} des empreintes)")
+                    continue
+                index.add(title, hashes, offsets)
+                new_files.append(filename)
+            except Exception as e:
+                stage.error()
+                logger.error(f"Erreur lors du calcul de l'empreinte de {filename}: {str(e)}")
+
+    index.save()
+    logger.info(f"Déduplication terminée: {len(new_files)}/{len(wav_files)} fichiers nouveaux")
+    return new_files
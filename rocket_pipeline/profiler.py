@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from loguru import logger
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _cpu_seconds():
+    """Temps CPU du processus et de ses enfants (ffmpeg lancé par yt-dlp / pydub)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _maxrss_mb(who):
+    """ru_maxrss en Mo : il est exprimé en octets sous macOS, en Ko sous Linux."""
+    maxrss = resource.getrusage(who).ru_maxrss
+    return maxrss / (1024.0 * 1024.0) if sys.platform == "darwin" else maxrss / 1024.0
+
+
+def _reset_peak_rss():
+    """Remet à zéro le pic de mémoire résidente du processus (Linux uniquement)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    """Pic de mémoire résidente du processus depuis la dernière remise à zéro (Mo)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    # Sans /proc (macOS) : pic depuis le démarrage du processus
+    return _maxrss_mb(resource.RUSAGE_SELF) if resource is not None else None
+
+
+def _peak_children_rss_mb():
+    """Pic de mémoire du plus gros processus enfant terminé (ffmpeg), depuis le démarrage (Mo)."""
+    return _maxrss_mb(resource.RUSAGE_CHILDREN) if resource is not None else None
+
+
+class StageStats:
+    """Compteurs d'une étape du pipeline."""
+
+    def __init__(self, name):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.items = 0
+        self.bytes = 0
+        self.errors = 0
+        self.peak_rss_mb = None
+        self.peak_children_rss_mb = None
+
+    def record(self, items=1, nbytes=0):
+        """Comptabilise des éléments traités (et leur volume en octets)."""
+        self.items += items
+        self.bytes += nbytes
+
+    def error(self, count=1):
+        self.errors += count
+
+    def record_peak_rss(self, peak_mb, children_peak_mb):
+        if peak_mb is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, peak_mb)
+        if children_peak_mb:
+            self.peak_children_rss_mb = max(self.peak_children_rss_mb or 0.0, children_peak_mb)
+
+    def to_dict(self):
+        wall = self.wall_seconds
+        return {
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "items": self.items,
+            "bytes": self.bytes,
+            "items_per_second": round(self.items / wall, 3) if wall > 0 else 0.0,
+            "mb_per_second": round(self.bytes / 1e6 / wall, 3) if wall > 0 else 0.0,
+            "peak_rss_mb": round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+            "peak_children_rss_mb": round(self.peak_children_rss_mb, 1) if self.peak_children_rss_mb is not None else None,
+            "errors": self.errors,
+        }
+
+
+class PipelineProfiler:
+    """
+    Mesure chaque étape du pipeline (temps réel et CPU, débit, mémoire, erreurs)
+    et produit un rapport JSON, et éventuellement un fichier texte Prometheus.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        self.started_at = datetime.utcnow().isoformat()
+        self.stages = {}
+        # Étapes en cours : temps (réel, CPU) passé dans leurs sous-étapes et pic de mémoire
+        # relevé avant chaque remise à zéro par une sous-étape
+        self._active = []
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Mesure un bloc de code ; plusieurs passages dans la même étape sont cumulés.
+
+        Une étape imbriquée dans une autre (par exemple le découpage lancé par yt-dlp
+        pendant le téléchargement) n'est comptée que dans l'étape la plus interne.
+        Le pic de mémoire est remis à zéro au début de chaque étape (sous Linux), il est
+        donc propre à l'étape ; celui des processus enfants ne peut pas l'être.
+        """
+        stats = self.stages.setdefault(name, StageStats(name))
+        if self._active:
+            parent = self._active[-1]
+            parent[2] = max(parent[2] or 0.0, _peak_rss_mb() or 0.0)
+        nested = [0.0, 0.0, None]
+        self._active.append(nested)
+        _reset_peak_rss()
+        wall_start, cpu_start = time.perf_counter(), _cpu_seconds()
+        try:
+            yield stats
+        except Exception:
+            stats.error()
+            raise
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = _cpu_seconds() - cpu_start
+            peak = _peak_rss_mb()
+            if peak is not None:
+                peak = max(peak, nested[2] or 0.0)
+            self._active.pop()
+            if self._active:
+                parent = self._active[-1]
+                parent[0] += wall
+                parent[1] += cpu
+                parent[2] = max(parent[2] or 0.0, peak or 0.0)
+            stats.wall_seconds += wall - nested[0]
+            stats.cpu_seconds += cpu - nested[1]
+            stats.record_peak_rss(peak, _peak_children_rss_mb())
+
+    def report(self):
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "finished_at": datetime.utcnow().isoformat(),
+            "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+        }
+
+    def write_report(self, report_dir, prometheus_textfile=None):
+        """
+        Écrit le rapport JSON de l'exécution et, si demandé, le fichier Prometheus.
+
+        Args:
+            report_dir: Répertoire des rapports JSON (un fichier par exécution)
+            prometheus_textfile: Chemin du fichier lu par le textfile collector de node_exporter
+
+        Returns:
+            Chemin du rapport JSON
+        """
+        report = self.report()
+        os.makedirs(report_dir, exist_ok=True)
+        report_path = os.path.join(report_dir, f"run_{self.run_id}.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Rapport d'exécution écrit dans {report_path}")
+
+        if prometheus_textfile:
+            self._write_prometheus(report, prometheus_textfile)
+        return report_path
+
+    def _write_prometheus(self, report, path):
+        lines = []
+        for metric in ("wall_seconds", "cpu_seconds", "items", "bytes", "items_per_second",
+                       "mb_per_second", "peak_rss_mb", "peak_children_rss_mb", "errors"):
+            lines.append(f"# TYPE pipeline_stage_{metric} gauge")
+            for name, stats in report["stages"].items():
+                if stats[metric] is not None:
+                    lines.append(f'pipeline_stage_{metric}{{stage="{name}"}} {stats[metric]}')
+        lines.append("# TYPE pipeline_last_run_timestamp_seconds gauge")
+        lines.append(f"pipeline_last_run_timestamp_seconds {time.time():.0f}")
+
+        # Écriture atomique : le collector ne doit jamais lire un fichier partiel
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        logger.info(f"Métriques Prometheus écrites dans {path}")
+
+
+profiler = PipelineProfiler()
@@ -1,12 +1,29 @@
 import os
+import json
+import shutil
+import subprocess
+import wave
+import numpy as np
 from loguru import logger
 import boto3
 from tqdm import tqdm
 from pydub import AudioSegment
 from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import PostProcessor
 from dotenv import load_dotenv
+from fingerprint import FingerprintIndex, compute_fingerprint, deduplicate_audio_files, FINGERPRINT_SAMPLE_RATE, MATCH_MIN_HASHES, MATCH_MIN_RATIO
+from profiler import profiler
 load_dotenv()
 
+SEGMENT_METADATA_FILENAME = "metadata.json"
+FRAME_LENGTH_MS = 30
+SPEECH_MIN_DBFS = -45.0
+SPEECH_NOISE_MARGIN_DB = 10.0
+# La parole alterne syllabes et creux : sur une fenêtre d'environ 1 s, une part notable de ses
+# trames est bien moins énergique que la moyenne, contrairement à la musique ou au bruit continu
+SPEECH_MODULATION_WINDOW_MS = 1000
+LOW_ENERGY_FACTOR = 0.5
+SPEECH_MIN_LOW_ENERGY_RATIO = 0.15
 
 
 def filter_videos_by_keywords(candidates, keywords):
@@ -16,15 +33,17 @@ def filter_videos_by_keywords(candidates, keywords):
         
     filtered_videos = []
     
-    for candidate in candidates:
-        if not isinstance(candidate, dict):
-            continue
+    with profiler.stage("filtering") as stage:
+        for candidate in candidates:
+            stage.record()
+            if not isinstance(candidate, dict):
+                continue
+                
+            title = str(candidate.get("title", "")).lower()
+            description = str(candidate.get("description", "")).lower()
             
-        title = str(candidate.get("title", "")).lower()
-        description = str(candidate.get("description", "")).lower()
-        
-        if any(keyword.lower() in title or keyword.lower() in description for keyword in keywords):
-            filtered_videos.append(candidate)
+            if any(keyword.lower() in title or keyword.lower() in description for keyword in keywords):
+                filtered_videos.append(candidate)
     
     logger.info(f"Filtrage terminé: {len(filtered_videos)}/{len(candidates)} vidéos correspondent aux mots-clés {keywords}")
     return filtered_videos
@@ -40,13 +59,14 @@ def get_videos_from_channel(channel_url):
         'quiet': True,
     }
     
-    with YoutubeDL(ydl_opts) as ydl:
+    with profiler.stage("listing") as stage, YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(channel_url, download=False)
         if 'entries' in info:
             videos = info['entries']
             videos_urls = [video for video in videos  if not "Shorts" in  video["title"]]
             videos_urls = sum([videos_url["entries"] for videos_url in videos_urls], [])
             logger.info(f"Nombre total  de videos trouvées: {len(videos_urls)}")
+            stage.record(len(videos_urls))
             return videos_urls
         else:
             logger.warning("Aucune vidéo trouvée sur cette chaîne")
@@ -72,16 +92,250 @@ def download_youtube_audios(videos, output_dir):
     }
     
     logger.info(f"Début du téléchargement de {len(videos)} vidéos")
-    with YoutubeDL(ydl_opts) as ydl:
-        for video in tqdm(videos, desc="Téléchargement des vidéos"):
-            try:
-                url = f"https://www.youtube.com/watch?v={video['id']}"
-                logger.info(f"Téléchargement de l'audio (WAV) : {video['title']}")
-                ydl.download([url])
-            except Exception as e:
-                logger.error(f"Erreur lors du téléchargement de {video.get('title', video.get('id', 'inconnu'))}: {str(e)}")
+    with profiler.stage("download") as stage:
+        # Volume réellement téléchargé, remonté par yt-dlp à la fin de chaque fichier
+        ydl_opts['progress_hooks'] = [
+            lambda d: stage.record(0, d.get('total_bytes') or d.get('downloaded_bytes') or 0) if d['status'] == 'finished' else None
+        ]
+        with YoutubeDL(ydl_opts) as ydl:
+            for video in tqdm(videos, desc="Téléchargement des vidéos"):
+                try:
+                    url = f"https://www.youtube.com/watch?v={video['id']}"
+                    logger.info(f"Téléchargement de l'audio (WAV) : {video['title']}")
+                    ydl.download([url])
+                    stage.record()
+                except Exception as e:
+                    stage.error()
+                    logger.error(f"Erreur lors du téléchargement de {video.get('title', video.get('id', 'inconnu'))}: {str(e)}")
+
+class SegmentAudioPP(PostProcessor):
+    """
+    Post-traitement yt-dlp qui découpe l'audio téléchargé en segments en une seule passe ffmpeg.
+
+    Le même décodage produit les segments WAV (`titre/partN.wav`) et un flux PCM mono 8 kHz
+    lu en mémoire, qui sert aux métadonnées des segments et à l'empreinte audio : aucun
+    WAV pleine longueur n'est écrit et l'audio n'est pas décodé une seconde fois.
+    """
+
+    def __init__(self, output_dir, segment_length, sample_rate=None, boundaries=None, index=None):
+        super().__init__()
+        self.output_dir = output_dir
+        self.segment_length = segment_length
+        self.sample_rate = sample_rate
+        self.boundaries = boundaries or {}
+        self.index = index
+        self.processed_segments = []
+        self.total_segments = 0
+
+    def _ffmpeg_command(self, filepath, video_folder, boundaries):
+        command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", filepath,
+                   "-map", "0:a:0", "-c:a", "pcm_s16le"]
+        if self.sample_rate:
+            command += ["-ar", str(self.sample_rate)]
+        if boundaries:
+            command += ["-f", "segment", "-segment_times", ",".join(f"{t:.3f}" for t in boundaries)]
+        else:
+            command += ["-f", "segment", "-segment_time", f"{self.segment_length / 1000:.3f}"]
+        command += ["-segment_start_number", "1", "-reset_timestamps", "1",
+                    os.path.join(video_folder, "part%d.wav")]
+        # Seconde sortie du même décodage : PCM mono 8 kHz envoyé sur stdout
+        command += ["-map", "0:a:0", "-ac", "1", "-ar", str(FINGERPRINT_SAMPLE_RATE),
+                    "-f", "s16le", "-c:a", "pcm_s16le", "pipe:1"]
+        return command
+
+    def run(self, info):
+        filepath = info["filepath"]
+        base_name = os.path.splitext(os.path.basename(filepath))[0]
+        video_folder = os.path.join(self.output_dir, base_name)
+        boundaries = self.boundaries.get(info.get("id"))
+
+        with profiler.stage("segmentation") as stage:
+            if self.index is not None and base_name in self.index:
+                logger.info(f"Déjà traité, ignoré: {base_name}")
+                return [filepath], info
+
+            os.makedirs(video_folder, exist_ok=True)
+            logger.info(f"Découpage direct de : {base_name} → dossier [{video_folder}]")
+            stage.record(0, os.path.getsize(filepath))
+            result = subprocess.run(self._ffmpeg_command(filepath, video_folder, boundaries), capture_output=True)
+            if result.returncode != 0:
+                stage.error()
+                shutil.rmtree(video_folder, ignore_errors=True)
+                logger.error(f"Erreur ffmpeg pour {base_name}: {result.stderr.decode(errors='replace').strip()}")
+                return [], info
+
+            pcm = AudioSegment(data=result.stdout, sample_width=2, frame_rate=FINGERPRINT_SAMPLE_RATE, channels=1)
+
+            if self.index is not None:
+                samples = np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+                hashes, offsets = compute_fingerprint(samples)
+                match_title, match_count, match_ratio = self.index.query(hashes, offsets, exclude=base_name)
+                if match_count >= MATCH_MIN_HASHES and match_ratio >= MATCH_MIN_RATIO:
+                    logger.warning(f"Doublon détecté: {base_name} ≈ {match_title} ({match_ratio:.0%} des empreintes)")
+                    shutil.rmtree(video_folder, ignore_errors=True)
+                    return [filepath], info
+                self.index.add(base_name, hashes, offsets)
+
+            segment_names = sorted((f for f in os.listdir(video_folder) if f.startswith("part") and f.endswith(".wav")),
+                                   key=lambda f: int(f[4:-4]))
+            segments_metadata = compute_segment_metadata(
+                pcm, self.segment_length, boundaries=[t * 1000 for t in boundaries] if boundaries else None)
+
+            # Les métadonnées sont calculées sur le flux 8 kHz : la fréquence est celle des segments écrits
+            segment_rate = self.sample_rate or info.get("asr")
+            if not segment_rate and segment_names:
+                with wave.open(os.path.join(video_folder, segment_names[0]), "rb") as wav:
+                    segment_rate = wav.getframerate()
+
+            title_metadata = {}
+            for name, metadata in zip(segment_names, segments_metadata):
+                metadata["sample_rate"] = int(segment_rate or metadata["sample_rate"])
+                title_metadata[name] = metadata
+                self.processed_segments.append(os.path.join(video_folder, name))
+                stage.record()
+
+            metadata_path = os.path.join(video_folder, SEGMENT_METADATA_FILENAME)
+            with open(metadata_path, "w", encoding="utf-8") as f:
+                json.dump(title_metadata, f, ensure_ascii=False, separators=(",", ":"))
+            self.processed_segments.append(metadata_path)
+            self.total_segments += len(segment_names)
+            logger.info(f"Fichier {base_name}: {len(segment_names)} segments créés")
+
+        # Le fichier téléchargé (compressé) n'est plus utile une fois découpé
+        return [filepath], info
+
+def download_and_segment_audios(videos, output_dir, segment_length, sample_rate=None, boundaries=None, index_dir=None):
+    """
+    Télécharge les audios et produit directement les segments, sans WAV intermédiaire.
+
+    Args:
+        videos: Liste des vidéos à télécharger
+        output_dir: Répertoire des segments audio (même disposition que segment_audio_files)
+        segment_length: Durée de chaque segment en ms
+        sample_rate: Fréquence d'échantillonnage des segments (celle de la source par défaut)
+        boundaries: Bornes de découpage par id de vidéo, en secondes (remplace segment_length)
+        index_dir: Répertoire de l'index d'empreintes pour écarter les doublons (optionnel)
+
+    Returns:
+        Nombre total de segments créés, et liste des fichiers à uploader
+    """
+    index = FingerprintIndex(index_dir) if index_dir else None
+    segmenter = SegmentAudioPP(output_dir, segment_length, sample_rate, boundaries, index)
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'outtmpl': f'{output_dir}/%(title)s.%(ext)s',
+        'quiet': False,
+    }
+
+    logger.info(f"Début du téléchargement et du découpage de {len(videos)} vidéos")
+    with profiler.stage("download") as stage:
+        ydl_opts['progress_hooks'] = [
+            lambda d: stage.record(0, d.get('total_bytes') or d.get('downloaded_bytes') or 0) if d['status'] == 'finished' else None
+        ]
+        with YoutubeDL(ydl_opts) as ydl:
+            ydl.add_post_processor(segmenter, when='post_process')
+            for video in tqdm(videos, desc="Téléchargement des vidéos"):
+                try:
+                    url = f"https://www.youtube.com/watch?v={video['id']}"
+                    logger.info(f"Téléchargement de l'audio : {video['title']}")
+                    ydl.download([url])
+                    stage.record()
+                except Exception as e:
+                    stage.error()
+                    logger.error(f"Erreur lors du téléchargement de {video.get('title', video.get('id', 'inconnu'))}: {str(e)}")
+
+    if index is not None:
+        index.save()
+    logger.info(f"Traitement terminé. Total des segments créés: {segmenter.total_segments}")
+    return segmenter.total_segments, segmenter.processed_segments
+
+def compute_segment_metadata(audio, segment_length, boundaries=None):
+    """
+    Calcule en une passe vectorisée les métadonnées de chaque segment d'un audio.
+
+    Pour chaque segment: durée, fréquence d'échantillonnage, niveaux RMS/crête (dBFS)
+    et une estimation de la proportion de parole. Une trame de 30 ms compte comme parole
+    si son énergie dépasse un seuil dérivé du bruit de fond du fichier et si son voisinage
+    présente la modulation d'énergie syllabique de la parole (proportion de trames peu
+    énergiques, LSTER) : la musique et les jingles, à l'énergie soutenue, sont écartés.
 
-def segment_audio_files(input_dir, output_dir, segment_length):
+    Args:
+        audio: AudioSegment pydub déjà chargé
+        segment_length: Durée de chaque segment en ms
+        boundaries: Points de coupe en ms (remplace segment_length), comme les bornes
+            de découpage de download_and_segment_audios
+
+    Returns:
+        Liste de dictionnaires, un par segment, dans l'ordre des segments
+    """
+    sample_rate = audio.frame_rate
+    samples = np.asarray(audio.get_array_of_samples(), dtype=np.float32)
+    if audio.channels > 1:
+        samples = samples.reshape(-1, audio.channels).mean(axis=1)
+    samples /= float(1 << (8 * audio.sample_width - 1))
+    num_samples = len(samples)
+
+    # Bornes des segments en échantillons, calculées comme pydub pour audio[i:i + segment_length] ;
+    # le dernier segment va jusqu'au dernier échantillon
+    if boundaries is None:
+        cuts_ms = np.arange(segment_length, len(audio), segment_length)
+    else:
+        cuts_ms = np.array(sorted(t for t in boundaries if 0 < t < len(audio)), dtype=np.float64)
+    seg_edges = np.concatenate(([0], (cuts_ms * sample_rate / 1000).astype(np.int64), [num_samples]))
+    seg_edges = np.minimum(seg_edges, num_samples)
+    seg_counts = np.diff(seg_edges)
+    num_segments = len(seg_counts)
+
+    # Trames de 30 ms recommençant au début de chaque segment (la dernière trame peut être partielle)
+    frame_len = max(1, sample_rate * FRAME_LENGTH_MS // 1000)
+    frames_per_seg = -(-seg_counts // frame_len)
+    first_frame = np.concatenate(([0], np.cumsum(frames_per_seg)[:-1]))
+    frame_seg = np.repeat(np.arange(num_segments), frames_per_seg)
+    frame_starts = seg_edges[:-1][frame_seg] + (np.arange(len(frame_seg)) - first_frame[frame_seg]) * frame_len
+    frame_counts = np.diff(np.append(frame_starts, num_samples))
+
+    eps = 1e-10
+    seg_energy = np.zeros(num_segments)
+    seg_peak = np.zeros(num_segments)
+    speech_frames = np.zeros(num_segments)
+    if len(frame_starts):
+        frame_energy = np.add.reduceat(samples * samples, frame_starts, dtype=np.float64)
+        frame_peak = np.maximum.reduceat(np.abs(samples), frame_starts)
+        frame_db = 10.0 * np.log10(frame_energy / frame_counts + eps)
+
+        # Bruit de fond estimé sur l'ensemble du fichier
+        noise_floor = np.percentile(frame_db, 10)
+        threshold = max(SPEECH_MIN_DBFS, noise_floor + SPEECH_NOISE_MARGIN_DB)
+
+        window = np.ones(max(1, SPEECH_MODULATION_WINDOW_MS // FRAME_LENGTH_MS))
+        window /= len(window)
+        frame_power = frame_energy / frame_counts
+        low_energy = frame_power < LOW_ENERGY_FACTOR * np.convolve(frame_power, window, mode="same")
+        modulated = np.convolve(low_energy, window, mode="same") >= SPEECH_MIN_LOW_ENERGY_RATIO
+        speech = (frame_db > threshold) & modulated
+
+        non_empty = frames_per_seg > 0
+        seg_energy[non_empty] = np.add.reduceat(frame_energy, first_frame[non_empty])
+        seg_peak[non_empty] = np.maximum.reduceat(frame_peak, first_frame[non_empty])
+        speech_frames[non_empty] = np.add.reduceat(speech, first_frame[non_empty])
+
+    seg_rms = np.sqrt(seg_energy / np.maximum(seg_counts, 1))
+    speech_ratio = speech_frames / np.maximum(frames_per_seg, 1)
+    # Durées arrondies à la milliseconde, comme len() d'un AudioSegment
+    seg_durations = np.round(seg_counts * 1000.0 / sample_rate) / 1000.0
+
+    return [
+        {
+            "duration": round(float(seg_durations[i]), 3),
+            "sample_rate": int(sample_rate),
+            "rms_dbfs": round(float(20.0 * np.log10(seg_rms[i] + eps)), 2),
+            "peak_dbfs": round(float(20.0 * np.log10(seg_peak[i] + eps)), 2),
+            "speech_ratio": round(float(speech_ratio[i]), 3),
+        }
+        for i in range(num_segments)
+    ]
+
+def segment_audio_files(input_dir, output_dir, segment_length, filenames=None):
     """
     Découpe les fichiers audio en segments.
     
@@ -89,48 +343,64 @@ def segment_audio_files(input_dir, output_dir, segment_length):
         input_dir: Répertoire des fichiers audio source (utilise INPUT_DIR par défaut)
         output_dir: Répertoire des segments audio (utilise OUTPUT_DIR par défaut)
         segment_length: Durée de chaque segment en ms (utilise SEGMENT_LENGTH_MS par défaut)
+        filenames: Fichiers WAV à traiter (tous ceux de input_dir par défaut)
     
     Returns:
-        Nombre total de segments créés
+        Nombre total de segments créés, et liste des fichiers à uploader
+        (segments et fichier de métadonnées de chaque titre)
     """
 
     
-    wav_files = [f for f in os.listdir(input_dir) if f.endswith(".wav")]
+    if filenames is None:
+        filenames = os.listdir(input_dir)
+    wav_files = [f for f in filenames if f.endswith(".wav")]
     logger.info(f"Nombre de fichiers WAV à traiter: {len(wav_files)}")
     
     total_segments = 0
     processed_segments = []
     
-    for filename in tqdm(wav_files, desc="Traitement des fichiers audio"):
-        try:
-            filepath = os.path.join(input_dir, filename)
-            audio = AudioSegment.from_wav(filepath)
-            duration = len(audio)
+    with profiler.stage("segmentation") as stage:
+        for filename in tqdm(wav_files, desc="Traitement des fichiers audio"):
+            try:
+                filepath = os.path.join(input_dir, filename)
+                audio = AudioSegment.from_wav(filepath)
+                stage.record(0, os.path.getsize(filepath))
+                duration = len(audio)
             
-            base_name = os.path.splitext(filename)[0]
+                base_name = os.path.splitext(filename)[0]
             
-            video_folder = os.path.join(output_dir, base_name)
-            os.makedirs(video_folder, exist_ok=True)
+                video_folder = os.path.join(output_dir, base_name)
+                os.makedirs(video_folder, exist_ok=True)
             
-            logger.info(f"Découpage de : {filename} → dossier [{video_folder}]")
+                logger.info(f"Découpage de : {filename} → dossier [{video_folder}]")
             
-            num_segments = (duration + segment_length - 1) // segment_length
-            segments_created = 0
+                num_segments = (duration + segment_length - 1) // segment_length
+                segments_created = 0
+                segments_metadata = compute_segment_metadata(audio, segment_length)
+                title_metadata = {}
             
-            for i in tqdm(range(0, duration, segment_length), 
-                          desc=f"Segments de {base_name}", 
-                          total=num_segments):
-                segment = audio[i:i + segment_length]
-                segment_name = f"part{i // segment_length + 1}.wav"
-                segment_path = os.path.join(video_folder, segment_name)
-                segment.export(segment_path, format="wav")
-                segments_created += 1
-                processed_segments.append(segment_path)
+                for i in tqdm(range(0, duration, segment_length), 
+                              desc=f"Segments de {base_name}", 
+                              total=num_segments):
+                    segment = audio[i:i + segment_length]
+                    segment_name = f"part{i // segment_length + 1}.wav"
+                    segment_path = os.path.join(video_folder, segment_name)
+                    segment.export(segment_path, format="wav")
+                    segments_created += 1
+                    stage.record()
+                    processed_segments.append(segment_path)
+                    title_metadata[segment_name] = segments_metadata[i // segment_length]
+
+                metadata_path = os.path.join(video_folder, SEGMENT_METADATA_FILENAME)
+                with open(metadata_path, "w", encoding="utf-8") as f:
+                    json.dump(title_metadata, f, ensure_ascii=False, separators=(",", ":"))
+                processed_segments.append(metadata_path)
             
-            logger.info(f"Fichier {filename}: {segments_created} segments créés")
-            total_segments += segments_created
-        except Exception as e:
-            logger.error(f"Erreur lors du traitement de {filename}: {str(e)}")
+                logger.info(f"Fichier {filename}: {segments_created} segments créés")
+                total_segments += segments_created
+            except Exception as e:
+                stage.error()
+                logger.error(f"Erreur lors du traitement de {filename}: {str(e)}")
     
     logger.info(f"Traitement terminé. Total des segments créés: {total_segments}")
     return total_segments, processed_segments
@@ -165,31 +435,60 @@ def upload_file_to_s3(s3_client, local_path, bucket_name, s3_key):
     try:
         s3_client.upload_file(local_path, bucket_name, s3_key)
         logger.info(f"Uploadé {local_path} vers s3://{bucket_name}/{s3_key}")
+        return True
     except Exception as e:
         logger.error(f"Erreur lors de l'upload de {local_path}: {str(e)}")
+        return False
 
 def upload_segments_to_s3(segments, bucket_name, prefix, segments_folder):
+    """
+    Envoie les segments (et fichiers de métadonnées) vers S3.
+
+    Returns:
+        Nombre de fichiers envoyés, et liste des fichiers dont l'upload a échoué
+    """
     
     s3_client = setup_s3_client()
     if not s3_client:
         logger.error("Client S3 non disponible. Upload annulé.")
-        return 0
+        return 0, list(segments)
     
     uploaded_count = 0
+    failed_segments = []
     logger.info(f"Début de l'upload des segments vers S3 (bucket: {bucket_name}, préfixe: {prefix})")
     
-    for segment_path in tqdm(segments, desc="Upload des segments vers S3"):
-        try:
-            relative_path = os.path.relpath(segment_path, start=segments_folder)
-            s3_key = f"{prefix}/{relative_path.replace(os.sep, '/')}"
+    with profiler.stage("upload") as stage:
+        for segment_path in tqdm(segments, desc="Upload des segments vers S3"):
+            try:
+                relative_path = os.path.relpath(segment_path, start=segments_folder)
+                s3_key = f"{prefix}/{relative_path.replace(os.sep, '/')}"
 
-            upload_file_to_s3(s3_client, segment_path, bucket_name, s3_key)
-            uploaded_count += 1
-        except Exception as e:
-            logger.error(f"Erreur lors de l'upload de {segment_path}: {str(e)}")
+                if upload_file_to_s3(s3_client, segment_path, bucket_name, s3_key):
+                    uploaded_count += 1
+                    stage.record(1, os.path.getsize(segment_path))
+                else:
+                    stage.error()
+                    failed_segments.append(segment_path)
+            except Exception as e:
+                stage.error()
+                failed_segments.append(segment_path)
+                logger.error(f"Erreur lors de l'upload de {segment_path}: {str(e)}")
     
     logger.info(f"Upload terminé. {uploaded_count}/{len(segments)} fichiers envoyés vers S3.")
-    return uploaded_count
+    return uploaded_count, failed_segments
+
+def get_completed_titles(processed_segments, segments_folder, failed_segments=()):
+    """
+    Renvoie les titres entièrement traités : découpage terminé (fichier de métadonnées écrit)
+    et aucun fichier du titre en échec d'upload.
+    """
+    failed_titles = {os.path.relpath(path, segments_folder).split(os.sep)[0] for path in failed_segments}
+    return [
+        os.path.basename(os.path.dirname(path))
+        for path in processed_segments
+        if os.path.basename(path) == SEGMENT_METADATA_FILENAME
+        and os.path.basename(os.path.dirname(path)) not in failed_titles
+    ]
 
 def main():
 
@@ -202,30 +501,55 @@ def main():
 
     RAW_AUDIO_DIR = "audios_sidpa_wav"  
     SEGMENT_AUDIO_DIR = "audios_segments_wav" 
+    FINGERPRINT_INDEX_DIR = "fingerprint_index"
 
     # Durée des segments en millisecondes
     SEGMENT_LENGTH_MS = 30 * 1000  # 30 secondes par défaut
 
+    # Découpage direct à la sortie du téléchargement (une seule passe ffmpeg, pas de WAV complet)
+    DIRECT_SEGMENTATION = False
+    SEGMENT_SAMPLE_RATE = None  # ex: 16000 pour rééchantillonner les segments
+
     # Configuration S3
     BUCKET_NAME = "moore-collection"  
     S3_PREFIX = "audios_wav" 
     USE_S3 = True  # Mettre à True pour activer les opérations S3
+
+    # Rapports de performance par étape
+    REPORT_DIR = "pipeline_reports"
+    PROMETHEUS_TEXTFILE = None  # ex: "/var/lib/node_exporter/textfile/moore_pipeline.prom"
     # ====================== FIN CHANGE ME ======================
 
     os.makedirs(RAW_AUDIO_DIR, exist_ok=True)
     os.makedirs(SEGMENT_AUDIO_DIR, exist_ok=True)
 
     logger.info("Démarrage du traitement des fichiers audio")
+    profiler.reset()
     
     videos = get_videos_from_channel(CHANNEL_URL)
     filtered_videos = filter_videos_by_keywords(videos, keywords=["sid pa"])
-    download_youtube_audios(filtered_videos, RAW_AUDIO_DIR)
-    
-    total_segments, processed_segments = segment_audio_files(RAW_AUDIO_DIR, SEGMENT_AUDIO_DIR, SEGMENT_LENGTH_MS)
+
+    if DIRECT_SEGMENTATION:
+        total_segments, processed_segments = download_and_segment_audios(
+            filtered_videos, SEGMENT_AUDIO_DIR, SEGMENT_LENGTH_MS,
+            sample_rate=SEGMENT_SAMPLE_RATE, index_dir=FINGERPRINT_INDEX_DIR)
+    else:
+        download_youtube_audios(filtered_videos, RAW_AUDIO_DIR)
+
+        # Écarter les épisodes déjà traités ou ré-uploadés sous un autre titre
+        new_audio_files = deduplicate_audio_files(RAW_AUDIO_DIR, FINGERPRINT_INDEX_DIR)
+        
+        total_segments, processed_segments = segment_audio_files(RAW_AUDIO_DIR, SEGMENT_AUDIO_DIR, SEGMENT_LENGTH_MS, new_audio_files)
     
+    failed_segments = []
     if USE_S3:
-        upload_segments_to_s3(processed_segments, BUCKET_NAME, S3_PREFIX, SEGMENT_AUDIO_DIR)
-    
+        _, failed_segments = upload_segments_to_s3(processed_segments, BUCKET_NAME, S3_PREFIX, SEGMENT_AUDIO_DIR)
+
+    # Les épisodes ne sont marqués traités qu'une fois leurs segments envoyés
+    completed_titles = get_completed_titles(processed_segments, SEGMENT_AUDIO_DIR, failed_segments)
+    FingerprintIndex(FINGERPRINT_INDEX_DIR).mark_completed(completed_titles)
+
+    profiler.write_report(REPORT_DIR, PROMETHEUS_TEXTFILE)
     logger.info("Traitement terminé avec succès")
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Les modules du pipeline s'importent entre eux par leur nom (exécution en script)
+sys.path.insert(0, os.path.join(ROOT, "rocket_pipeline"))
+sys.path.insert(0, ROOT)
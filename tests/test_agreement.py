@@ -0,0 +1,95 @@
+import unicodedata
+
+import numpy as np
+import pytest
+
+from utils import utils_agreement as ua
+
+BOUNDARY_LENGTHS = [0, 1, 63, 64, 65, 127, 128, 129, 300]
+
+
+def levenshtein(a, b):
+    """Distance d'édition de référence, ligne par ligne en Python pur."""
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def random_pairs(seed, alphabet_size, num_pairs=60):
+    """Paires aléatoires de séquences proches, dont les longueurs encadrent les mots de 64 bits."""
+    rng = np.random.default_rng(seed)
+    lengths = BOUNDARY_LENGTHS + list(rng.integers(0, 301, num_pairs - len(BOUNDARY_LENGTHS)))
+    seqs_a, seqs_b = [], []
+    for i, length in enumerate(lengths):
+        a = rng.integers(0, alphabet_size, length)
+        b = a.copy()
+        for _ in range(rng.integers(0, 20)):
+            op, pos = rng.integers(0, 3), rng.integers(0, len(b) + 1)
+            if op == 0:
+                b = np.insert(b, pos, rng.integers(0, alphabet_size))
+            elif len(b) and op == 1:
+                b = np.delete(b, min(pos, len(b) - 1))
+            elif len(b):
+                b[min(pos, len(b) - 1)] = rng.integers(0, alphabet_size)
+        # Longueurs aux bornes des deux côtés
+        if i < len(BOUNDARY_LENGTHS):
+            b = rng.integers(0, alphabet_size, BOUNDARY_LENGTHS[-1 - i])
+        seqs_a.append(a.astype(np.int64))
+        seqs_b.append(b.astype(np.int64))
+    return seqs_a, seqs_b
+
+
+def lengths(seqs):
+    return np.array([len(s) for s in seqs], dtype=np.int64)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_bit_parallel_matches_reference(seed):
+    seqs_a, seqs_b = random_pairs(seed, alphabet_size=6)
+    symbols = np.unique(np.concatenate(seqs_a + seqs_b))
+    expected = [levenshtein(a.tolist(), b.tolist()) for a, b in zip(seqs_a, seqs_b)]
+    result = ua._bit_parallel_edit_distance(seqs_a, seqs_b, lengths(seqs_a), lengths(seqs_b), symbols)
+    assert result.tolist() == expected
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_row_dp_matches_reference(seed):
+    seqs_a, seqs_b = random_pairs(seed, alphabet_size=6)
+    expected = [levenshtein(a.tolist(), b.tolist()) for a, b in zip(seqs_a, seqs_b)]
+    result = ua._row_edit_distance(seqs_a, seqs_b, lengths(seqs_a), lengths(seqs_b))
+    assert result.tolist() == expected
+
+
+@pytest.mark.parametrize("alphabet_size", [6, 5000])
+def test_batched_edit_distance_uses_both_paths(alphabet_size, monkeypatch):
+    seqs_a, seqs_b = random_pairs(42, alphabet_size)
+    expected = [levenshtein(a.tolist(), b.tolist()) for a, b in zip(seqs_a, seqs_b)]
+    # Lots de petite taille : plusieurs lots, de longueurs différentes
+    monkeypatch.setattr(ua, "BATCH_SIZE", 16)
+    assert ua.batched_edit_distance(seqs_a, seqs_b).tolist() == expected
+
+
+def test_empty_sequences():
+    empty = np.array([], dtype=np.int64)
+    abc = np.array([1, 2, 3], dtype=np.int64)
+    assert ua.batched_edit_distance([empty, empty, abc], [empty, abc, empty]).tolist() == [0, 3, 3]
+    assert ua.batched_edit_distance([], []).tolist() == []
+
+
+def test_texts_are_nfc_normalized():
+    composed = "a bẽ wã"
+    decomposed = unicodedata.normalize("NFD", composed)
+    assert decomposed != composed
+    assert ua.normalize_text(decomposed) == ua.normalize_text(composed.upper())
+
+    annotations = [
+        {"audio_path": "titre/part1.wav", "user": "a", "transcription": composed, "traduction": "x"},
+        {"audio_path": "titre/part1.wav", "user": "b", "transcription": decomposed, "traduction": "x"},
+    ]
+    df = ua.calculate_pairwise_agreement(annotations)
+    assert df["cer"].tolist() == [0.0, 0.0]
+    assert df["wer"].tolist() == [0.0, 0.0]
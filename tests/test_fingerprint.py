@@ -0,0 +1,68 @@
+import numpy as np
+
+import fingerprint as fp
+
+
+def synthetic_episode(seed, seconds=120):
+    """Suite de syllabes harmoniques de hauteur et durée aléatoires, à 8 kHz."""
+    rng = np.random.default_rng(seed)
+    n = fp.FINGERPRINT_SAMPLE_RATE * seconds
+    x = np.zeros(n, dtype=np.float32)
+    pos = 0
+    while pos < n - fp.FINGERPRINT_SAMPLE_RATE:
+        length = int(rng.uniform(0.08, 0.4) * fp.FINGERPRINT_SAMPLE_RATE)
+        f0 = rng.uniform(90, 300)
+        t = np.arange(length) / fp.FINGERPRINT_SAMPLE_RATE
+        syllable = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 12))
+        x[pos:pos + length] += (np.hanning(length) * syllable * rng.uniform(0.2, 0.6)).astype(np.float32)
+        pos += length + int(rng.uniform(0, 0.15) * fp.FINGERPRINT_SAMPLE_RATE)
+    return x + rng.normal(0, 0.01, n).astype(np.float32)
+
+
+def build_index(tmp_path, seeds):
+    index = fp.FingerprintIndex(str(tmp_path / "index"))
+    for seed in seeds:
+        index.add(f"episode{seed}", *fp.compute_fingerprint(synthetic_episode(seed)))
+    return index
+
+
+def test_shifted_copy_is_detected(tmp_path):
+    index = build_index(tmp_path, range(5))
+    original = synthetic_episode(3)
+    noise = np.random.default_rng(0).normal(0, 0.1, len(original)).astype(np.float32)
+    for shift in (0, 64, 128, 512, 1000):
+        copy = np.concatenate([np.zeros(shift, dtype=np.float32), original])[:len(original)] + noise
+        title, count, ratio = index.query(*fp.compute_fingerprint(copy))
+        assert title == "episode3"
+        assert count >= fp.MATCH_MIN_HASHES and ratio >= fp.MATCH_MIN_RATIO, (shift, ratio)
+
+
+def test_unrelated_episode_is_not_a_duplicate(tmp_path):
+    index = build_index(tmp_path, range(5))
+    _, _, ratio = index.query(*fp.compute_fingerprint(synthetic_episode(100)))
+    assert ratio < fp.MATCH_MIN_RATIO
+
+
+def test_index_round_trip(tmp_path):
+    index = build_index(tmp_path, range(3))
+    index.save()
+    index.mark_completed([f"episode{i}" for i in range(3)])
+    reloaded = fp.FingerprintIndex(str(tmp_path / "index"))
+    title, _, ratio = reloaded.query(*fp.compute_fingerprint(synthetic_episode(1)))
+    assert title == "episode1" and ratio > 0.5
+
+
+def test_episode_is_only_skipped_once_completed(tmp_path):
+    index = build_index(tmp_path, [1])
+    index.save()
+
+    # Découpage ou upload en échec : l'épisode est repris et ne se détecte pas lui-même
+    reloaded = fp.FingerprintIndex(str(tmp_path / "index"))
+    hashes, offsets = fp.compute_fingerprint(synthetic_episode(1))
+    assert "episode1" not in reloaded
+    assert reloaded.query(hashes, offsets, exclude="episode1")[0] is None
+
+    reloaded.mark_completed(["episode1"])
+    completed = fp.FingerprintIndex(str(tmp_path / "index"))
+    assert "episode1" in completed
+    assert completed.query(hashes, offsets, exclude="episode1bis")[0] == "episode1"
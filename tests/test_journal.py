@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from utils import utils_journal as uj
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "journal.jsonl")
+
+
+def payload(name):
+    return {"audio_path": f"titre/{name}.wav", "user": "a", "transcription": name}
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_appended_annotations_are_pending_until_flushed(journal_path):
+    for name in ("part1", "part2"):
+        uj.append_to_journal(payload(name), journal_path=journal_path)
+    assert [p["audio_path"] for p in uj.load_pending_annotations(journal_path)] == ["titre/part1.wav", "titre/part2.wav"]
+
+    uploaded = []
+    assert uj.flush_journal(uploaded.append, journal_path=journal_path) == 2
+    assert [p["audio_path"] for p in uploaded] == ["titre/part1.wav", "titre/part2.wav"]
+    assert uj.load_pending_annotations(journal_path) == []
+
+
+def test_failed_upload_is_kept_with_backoff(journal_path):
+    for name in ("part1", "bad", "part3"):
+        uj.append_to_journal(payload(name), journal_path=journal_path)
+    calls = []
+
+    def upload(p):
+        calls.append(p["audio_path"])
+        if "bad" in p["audio_path"]:
+            raise IOError("refusé")
+
+    assert uj.flush_journal(upload, journal_path=journal_path) == 2
+    (entry,) = read_lines(journal_path)
+    assert entry["payload"]["audio_path"] == "titre/bad.wav"
+    assert entry["attempts"] == 1 and entry["next_attempt_at"] > 0
+
+    # Pas de nouvelle tentative avant la fin du délai
+    calls.clear()
+    assert uj.flush_journal(upload, journal_path=journal_path) == 0
+    assert calls == []
+
+
+def test_entry_is_moved_to_dead_letter_after_max_attempts(journal_path, monkeypatch):
+    monkeypatch.setattr(uj, "MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(uj, "MAX_BACKOFF_SECONDS", 0.0)
+    uj.append_to_journal(payload("bad"), journal_path=journal_path)
+
+    def upload(p):
+        raise IOError("audio_path inconnu")
+
+    for _ in range(3):
+        uj.flush_journal(upload, journal_path=journal_path)
+
+    assert uj.load_pending_annotations(journal_path) == []
+    (dead,) = read_lines(uj.dead_letter_path(journal_path))
+    assert dead["payload"]["audio_path"] == "titre/bad.wav"
+    assert dead["attempts"] == 3 and dead["error"] == "audio_path inconnu"
+
+
+def test_annotation_appended_during_flush_is_kept(journal_path):
+    uj.append_to_journal(payload("part1"), journal_path=journal_path)
+
+    def upload(p):
+        # Un annotateur soumet pendant l'envoi (hors du verrou du journal)
+        uj.append_to_journal(payload("part2"), journal_path=journal_path)
+
+    assert uj.flush_journal(upload, journal_path=journal_path) == 1
+    assert [p["audio_path"] for p in uj.load_pending_annotations(journal_path)] == ["titre/part2.wav"]
@@ -0,0 +1,43 @@
+import unicodedata
+
+from utils.utils_orthography import MOORE_ALPHABET, SPECIAL_TAGS, MooreOrthography
+
+orthography = MooreOrthography(MOORE_ALPHABET, SPECIAL_TAGS)
+
+
+def test_valid_transcription_has_no_error_nor_warning():
+    text = "Ned yaa bʋʋdã, a wẽnd n kõt-a #rires."
+    assert orthography.validate(text) == []
+    assert orthography.warnings(text) == []
+
+
+def test_decomposed_letters_are_accepted():
+    assert orthography.warnings(unicodedata.normalize("NFD", "a wẽnd n kõta")) == []
+
+
+def test_tags_are_case_insensitive():
+    assert orthography.validate("#Musique a yeel #bruit") == []
+    assert orthography.warnings("#Musique a yeel #bruit") == []
+
+
+def test_unknown_tag_is_an_error():
+    errors = orthography.validate("a yeel #applaudissements")
+    assert len(errors) == 1 and "#applaudissements" in errors[0]
+    # Une balise connue suivie d'autres lettres n'est pas reconnue
+    assert orthography.validate("#MUSIQUEs") != []
+
+
+def test_proper_nouns_only_raise_a_warning():
+    text = "Macron la Jean sẽn yeel Covid"
+    assert orthography.validate(text) == []
+    (warning,) = orthography.warnings(text)
+    assert warning.endswith("c j")
+
+
+def test_corpus_statistics_merge_tag_spellings():
+    stats = orthography.corpus_statistics(["a yeel #Musique", "#MUSIQUE ba", "Jean #toux"])
+    tags = stats["tags"].set_index("balise")
+    assert tags.loc["#MUSIQUE", "occurrences"] == 2
+    assert not tags.loc["#toux", "connue"]
+    assert stats["invalid_texts"] == 1
+    assert stats["invalid_chars"]["caractère"].tolist() == ["j"]
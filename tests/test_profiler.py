@@ -0,0 +1,51 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from profiler import PipelineProfiler
+
+
+def test_nested_stage_is_not_counted_twice():
+    profiler = PipelineProfiler()
+    with profiler.stage("download"):
+        time.sleep(0.05)
+        with profiler.stage("segmentation"):
+            time.sleep(0.1)
+
+    report = profiler.report()["stages"]
+    assert 0.04 <= report["download"]["wall_seconds"] < 0.09
+    assert report["segmentation"]["wall_seconds"] >= 0.1
+
+
+@pytest.mark.skipif(not os.access("/proc/self/clear_refs", os.W_OK), reason="remise à zéro du pic mémoire indisponible")
+def test_peak_rss_is_measured_per_stage():
+    profiler = PipelineProfiler()
+    with profiler.stage("fingerprint"):
+        with profiler.stage("segmentation"):
+            buffer = np.ones(50_000_000)  # ~400 Mo
+            del buffer
+    with profiler.stage("upload"):
+        pass
+
+    report = profiler.report()["stages"]
+    assert report["segmentation"]["peak_rss_mb"] > 300
+    assert report["fingerprint"]["peak_rss_mb"] > 300
+    assert report["upload"]["peak_rss_mb"] < report["segmentation"]["peak_rss_mb"] - 300
+
+
+@pytest.mark.parametrize("platform, maxrss", [("linux", 512 * 1024), ("darwin", 512 * 1024 * 1024)])
+def test_maxrss_is_converted_to_megabytes(monkeypatch, platform, maxrss):
+    import profiler as profiler_module
+
+    class FakeResource:
+        RUSAGE_SELF, RUSAGE_CHILDREN = 0, -1
+
+        @staticmethod
+        def getrusage(who):
+            return type("Usage", (), {"ru_maxrss": maxrss})
+
+    monkeypatch.setattr(profiler_module, "resource", FakeResource)
+    monkeypatch.setattr(profiler_module.sys, "platform", platform)
+    assert profiler_module._peak_children_rss_mb() == 512.0
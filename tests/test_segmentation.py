@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+from pydub import AudioSegment
+
+import youtuber
+
+# Le découpage en une passe appelle le binaire `ffmpeg` du PATH (paquet système, ou binaire
+# statique de ffmpeg.org). Le paquet PyPI « ffmpeg » ne fournit pas ce binaire ; celui
+# d'imageio-ffmpeg (imageio_ffmpeg.get_ffmpeg_exe()) convient s'il est lié sous le nom `ffmpeg`.
+FFMPEG_MISSING = shutil.which("ffmpeg") is None
+
+
+def noise_audio(sample_rate, seconds, channels=1, seed=0):
+    rng = np.random.default_rng(seed)
+    samples = (rng.standard_normal(int(sample_rate * seconds) * channels) * 3000).astype(np.int16)
+    return AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=sample_rate, channels=channels)
+
+
+@pytest.mark.parametrize("sample_rate", [22050, 11025, 16000])
+def test_segment_metadata_matches_pydub_slices(sample_rate):
+    audio = noise_audio(sample_rate, 123.4567)
+    segment_length = 10000
+    segments = [audio[i:i + segment_length] for i in range(0, len(audio), segment_length)]
+
+    metadata = youtuber.compute_segment_metadata(audio, segment_length)
+
+    assert len(metadata) == len(segments)
+    for meta, segment in zip(metadata, segments):
+        assert meta["duration"] == pytest.approx(len(segment) / 1000, abs=0.002)
+        assert meta["rms_dbfs"] == pytest.approx(20 * np.log10(segment.rms / 32768), abs=0.05)
+        assert meta["peak_dbfs"] == pytest.approx(20 * np.log10(segment.max / 32768), abs=0.05)
+
+
+def test_segment_metadata_with_boundaries():
+    audio = noise_audio(16000, 30)
+    boundaries = [4500, 12000, 25250]
+    edges = [0] + boundaries + [len(audio)]
+    segments = [audio[start:end] for start, end in zip(edges[:-1], edges[1:])]
+
+    metadata = youtuber.compute_segment_metadata(audio, 10000, boundaries=boundaries)
+
+    assert [meta["duration"] for meta in metadata] == [len(segment) / 1000 for segment in segments]
+    for meta, segment in zip(metadata, segments):
+        assert meta["rms_dbfs"] == pytest.approx(20 * np.log10(segment.rms / 32768), abs=0.05)
+
+
+@pytest.mark.skipif(FFMPEG_MISSING, reason="binaire ffmpeg introuvable dans le PATH")
+@pytest.mark.parametrize("sample_rate", [None, 16000])
+def test_single_pass_segmentation_matches_pydub(tmp_path, sample_rate):
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    noise_audio(22050, 65.3, channels=2).export(str(source_dir / "episode.wav"), format="wav")
+    segment_length = 10000
+
+    segmenter = youtuber.SegmentAudioPP(str(tmp_path / "direct"), segment_length, sample_rate)
+    segmenter.run({"filepath": str(source_dir / "episode.wav"), "id": "episode"})
+    youtuber.segment_audio_files(str(source_dir), str(tmp_path / "pydub"), segment_length)
+
+    direct_parts = sorted(os.listdir(tmp_path / "direct" / "episode"))
+    pydub_parts = sorted(os.listdir(tmp_path / "pydub" / "episode"))
+    assert direct_parts == pydub_parts
+    assert segmenter.total_segments == len(pydub_parts) - 1  # sans metadata.json
+
+    with open(tmp_path / "direct" / "episode" / youtuber.SEGMENT_METADATA_FILENAME, encoding="utf-8") as f:
+        metadata = json.load(f)
+    for name in pydub_parts:
+        if not name.endswith(".wav"):
+            continue
+        direct = AudioSegment.from_wav(str(tmp_path / "direct" / "episode" / name))
+        reference = AudioSegment.from_wav(str(tmp_path / "pydub" / "episode" / name))
+        # Le muxer segment d'ffmpeg coupe sur des paquets PCM, à quelques dizaines de ms près
+        assert abs(len(direct) - len(reference)) <= 100
+        assert direct.frame_rate == (sample_rate or 22050)
+        assert metadata[name]["sample_rate"] == direct.frame_rate
+        assert metadata[name]["duration"] == pytest.approx(len(reference) / 1000, abs=0.1)
+
+
+def speech_like(sample_rate, seconds, seed):
+    """Syllabes harmoniques séparées de courts silences."""
+    rng = np.random.default_rng(seed)
+    x = np.zeros(sample_rate * seconds)
+    pos = 0
+    while pos < len(x) - sample_rate:
+        length = int(rng.uniform(0.08, 0.3) * sample_rate)
+        t = np.arange(length) / sample_rate
+        f0 = rng.uniform(90, 250)
+        x[pos:pos + length] += np.hanning(length) * sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 12)) * 0.3
+        pos += length + int(rng.uniform(0, 0.12) * sample_rate)
+    return x
+
+
+def music_like(sample_rate, seconds, seed):
+    """Accords tenus de 0,5 s sur une basse continue, avec une caisse claire tous les quarts de seconde."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(sample_rate * seconds) / sample_rate
+    x = 0.15 * np.sin(2 * np.pi * 110 * t)
+    note = sample_rate // 2
+    for start in range(0, len(x), note):
+        tt = t[start:start + note] - t[start]
+        f = rng.choice([220, 262, 294, 330, 392])
+        envelope = np.minimum(1, tt * 50) * np.exp(-tt)
+        x[start:start + note] += 0.2 * envelope * sum(np.sin(2 * np.pi * f * c * tt) for c in (1, 1.25, 1.5))
+    for start in range(0, len(x), sample_rate // 4):
+        hit = x[start:start + 800]
+        x[start:start + 800] += rng.normal(0, 0.3, len(hit)) * np.exp(-np.arange(len(hit)) / 300)
+    return x
+
+
+def test_music_is_not_counted_as_speech():
+    sample_rate = 16000
+    rng = np.random.default_rng(0)
+    signal = np.concatenate([speech_like(sample_rate, 20, 1), music_like(sample_rate, 20, 2),
+                             speech_like(sample_rate, 20, 3)])
+    signal += rng.normal(0, 0.005, len(signal))
+    samples = (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+    audio = AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=sample_rate, channels=1)
+
+    ratios = [meta["speech_ratio"] for meta in youtuber.compute_segment_metadata(audio, 10000)]
+
+    assert min(ratios[:2] + ratios[4:]) > 0.5
+    assert max(ratios[2:4]) < 0.1
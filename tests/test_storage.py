@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+from utils.utils_storage import CachedStorage, LocalStorage
+
+
+class CountingStorage(LocalStorage):
+    """Stockage local lent qui compte les lectures, à la manière d'un S3 distant."""
+
+    def __init__(self, root, delay=0.0):
+        super().__init__(root)
+        self.delay = delay
+        self.reads = 0
+        self._lock = threading.Lock()
+
+    def get_bytes(self, key, length=None):
+        with self._lock:
+            self.reads += 1
+        time.sleep(self.delay)
+        return super().get_bytes(key, length)
+
+
+def cached_files(cache_dir):
+    return sorted(LocalStorage(str(cache_dir)).list_keys())
+
+
+def test_least_recently_used_segment_is_evicted(tmp_path):
+    backend = CountingStorage(str(tmp_path / "remote"))
+    for name in "abc":
+        backend.put_bytes(f"titre/{name}.wav", b"x" * 100)
+    cache = CachedStorage(backend, str(tmp_path / "cache"), max_bytes=250)
+
+    cache.get_bytes("titre/a.wav")
+    cache.get_bytes("titre/b.wav")
+    cache.get_bytes("titre/a.wav")  # a redevient le plus récent
+    cache.get_bytes("titre/c.wav")
+
+    assert cached_files(tmp_path / "cache") == ["titre/a.wav", "titre/c.wav"]
+    assert backend.reads == 3
+
+    # L'ordre LRU est repris du disque au redémarrage
+    restarted = CachedStorage(backend, str(tmp_path / "cache"), max_bytes=150)
+    assert restarted._total_bytes == 100
+
+
+def test_concurrent_misses_download_once(tmp_path):
+    backend = CountingStorage(str(tmp_path / "remote"), delay=0.05)
+    payload = os.urandom(200_000)
+    backend.put_bytes("titre/part1.wav", payload)
+    cache = CachedStorage(backend, str(tmp_path / "cache"), max_bytes=10_000_000)
+
+    results, errors = [], []
+
+    def worker(read_bytes):
+        try:
+            if read_bytes:
+                results.append(cache.get_bytes("titre/part1.wav"))
+            else:
+                with open(cache.get_url("titre/part1.wav"), "rb") as f:
+                    results.append(f.read())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i % 2 == 0,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert results == [payload] * 8
+    assert backend.reads == 1
+
+
+def test_concurrent_writes_of_the_same_key(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    errors = []
+
+    def writer(i):
+        try:
+            for _ in range(20):
+                storage.put_bytes("titre/part1.wav", bytes([i]) * 10_000)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    data = storage.get_bytes("titre/part1.wav")
+    assert len(data) == 10_000 and len(set(data)) == 1
+    assert list(storage.list_keys()) == ["titre/part1.wav"]
+    assert os.listdir(tmp_path / "titre") == ["part1.wav"]
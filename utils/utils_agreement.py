@@ -0,0 +1,220 @@
+import re
+import unicodedata
+from collections import defaultdict
+from itertools import combinations
+import numpy as np
+import pandas as pd
+
+AGREEMENT_FIELDS = ["transcription", "traduction"]
+BATCH_SIZE = 8192
+# Taille maximale (symboles x mots de 64 bits) des masques par paire pour l'algorithme bit-parallèle
+MAX_BIT_PARALLEL_CELLS = 1024
+
+
+def normalize_text(text):
+    """Normalise un texte avant comparaison (NFC, minuscules, espaces réduits)."""
+    text = unicodedata.normalize("NFC", str(text or ""))
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def _row_edit_distance(seqs_a, seqs_b, la, lb):
+    """Programmation dynamique ligne par ligne, vectorisée sur un lot de paires."""
+    max_a, max_b = int(la.max()), int(lb.max())
+    a = np.full((len(seqs_a), max_a), -1, dtype=np.int64)
+    b = np.full((len(seqs_b), max_b), -2, dtype=np.int64)
+    for k in range(len(seqs_a)):
+        a[k, :la[k]] = seqs_a[k]
+        b[k, :lb[k]] = seqs_b[k]
+
+    cols = np.arange(max_b + 1)
+    prev = np.broadcast_to(cols, (len(seqs_a), max_b + 1)).copy()
+    result = lb.copy()
+    for i in range(1, max_a + 1):
+        current = np.empty_like(prev)
+        current[:, 0] = i
+        current[:, 1:] = np.minimum(prev[:, 1:] + 1, prev[:, :-1] + (b != a[:, i - 1:i]))
+        # Dépendance horizontale (insertion) résolue sans boucle sur les colonnes
+        current = np.minimum.accumulate(current - cols, axis=1) + cols
+        done = la == i
+        result[done] = current[done, lb[done]]
+        prev = current
+    return result
+
+
+def _bit_parallel_edit_distance(seqs_a, seqs_b, la, lb, symbols):
+    """
+    Algorithme bit-parallèle de Myers (version par blocs de 64 bits de Hyyrö),
+    vectorisé sur un lot de paires : une itération par symbole de la seconde séquence.
+    """
+    num_pairs = len(seqs_a)
+    num_words = max(1, -(-int(la.max()) // 64))
+    rows = np.arange(num_pairs)
+
+    # Masques de correspondance : bit i de peq[k, s, w] = (a_k[64w + i] == s)
+    peq = np.zeros((num_pairs, len(symbols), num_words), dtype=np.uint64)
+    if la.sum():
+        pair_idx = np.repeat(rows, la)
+        positions = np.concatenate([np.arange(n) for n in la])
+        codes = np.searchsorted(symbols, np.concatenate(seqs_a))
+        np.bitwise_or.at(peq, (pair_idx, codes, positions // 64), np.left_shift(np.uint64(1), (positions % 64).astype(np.uint64)))
+
+    max_b = int(lb.max())
+    b = np.zeros((num_pairs, max_b), dtype=np.int64)
+    for k in range(num_pairs):
+        b[k, :lb[k]] = np.searchsorted(symbols, seqs_b[k])
+
+    one, zero = np.uint64(1), np.uint64(0)
+    high_bit = np.uint64(1 << 63)
+    last_word = np.maximum(la - 1, 0) // 64
+    last_bit = np.left_shift(one, (np.maximum(la - 1, 0) % 64).astype(np.uint64))
+    pv = np.full((num_words, num_pairs), np.uint64(~np.uint64(0)))
+    mv = np.zeros((num_words, num_pairs), dtype=np.uint64)
+    score = la.astype(np.int64).copy()
+
+    for j in range(max_b):
+        active = j < lb
+        eq_all = peq[rows, b[:, j]]
+        h_in = np.ones(num_pairs, dtype=np.int64)
+        for w in range(num_words):
+            eq = eq_all[:, w]
+            xv = eq | mv[w]
+            eq = eq | np.where(h_in < 0, one, zero)
+            xh = (((eq & pv[w]) + pv[w]) ^ pv[w]) | eq
+            ph = mv[w] | ~(xh | pv[w])
+            mh = pv[w] & xh
+
+            is_last = last_word == w
+            out_bit = np.where(is_last, last_bit, high_bit)
+            h_out = (ph & out_bit != 0).astype(np.int64) - (mh & out_bit != 0).astype(np.int64)
+            score += np.where(is_last & active, h_out, 0)
+
+            ph = (ph << one) | np.where(h_in > 0, one, zero)
+            mh = (mh << one) | np.where(h_in < 0, one, zero)
+            pv[w] = np.where(active, mh | ~(xv | ph), pv[w])
+            mv[w] = np.where(active, ph & xv, mv[w])
+            h_in = h_out
+
+    return np.where(la == 0, lb, score)
+
+
+def batched_edit_distance(seqs_a, seqs_b):
+    """
+    Calcule la distance de Levenshtein entre chaque paire (seqs_a[k], seqs_b[k]).
+
+    Les paires sont triées par longueur puis traitées par lots. Lorsque l'alphabet du lot
+    est petit (caractères), on utilise l'algorithme bit-parallèle de Myers ; sinon (mots),
+    une programmation dynamique vectorisée ligne par ligne.
+
+    Args:
+        seqs_a: Liste de séquences d'entiers
+        seqs_b: Liste de séquences d'entiers (même longueur que seqs_a)
+
+    Returns:
+        Tableau des distances (int)
+    """
+    num_pairs = len(seqs_a)
+    distances = np.zeros(num_pairs, dtype=np.int64)
+    if num_pairs == 0:
+        return distances
+
+    len_a = np.array([len(s) for s in seqs_a], dtype=np.int64)
+    len_b = np.array([len(s) for s in seqs_b], dtype=np.int64)
+    # Regrouper les paires de longueurs proches limite le remplissage des lots
+    order = np.lexsort((len_b, len_a))
+
+    for start in range(0, num_pairs, BATCH_SIZE):
+        idx = order[start:start + BATCH_SIZE]
+        batch_a = [np.asarray(seqs_a[k], dtype=np.int64) for k in idx]
+        batch_b = [np.asarray(seqs_b[k], dtype=np.int64) for k in idx]
+        la, lb = len_a[idx], len_b[idx]
+        if lb.max() == 0:
+            distances[idx] = la
+            continue
+        symbols = np.unique(np.concatenate(batch_a + batch_b))
+        num_words = -(-int(la.max()) // 64)
+        if len(symbols) * num_words <= MAX_BIT_PARALLEL_CELLS:
+            distances[idx] = _bit_parallel_edit_distance(batch_a, batch_b, la, lb, symbols)
+        else:
+            distances[idx] = _row_edit_distance(batch_a, batch_b, la, lb)
+
+    return distances
+
+
+def _encode(texts, tokenize):
+    """Convertit des textes en séquences d'entiers (caractères ou mots)."""
+    if not tokenize:
+        return [np.frombuffer(t.encode("utf-32-le"), dtype=np.uint32) for t in texts]
+    vocabulary = {}
+    return [np.array([vocabulary.setdefault(w, len(vocabulary)) for w in t.split()], dtype=np.int64) for t in texts]
+
+
+def group_annotations_by_segment(annotations):
+    """Regroupe les annotations par segment audio (un seul avis par utilisateur)."""
+    grouped = defaultdict(dict)
+    for ann in annotations:
+        audio_path, user = ann.get("audio_path"), ann.get("user")
+        if audio_path and user:
+            grouped[audio_path][user] = ann
+    return grouped
+
+
+def calculate_pairwise_agreement(annotations):
+    """
+    Calcule CER et WER entre chaque paire d'annotateurs d'un même segment.
+
+    Les taux sont symétriques : la distance d'édition est rapportée à la longueur
+    moyenne des deux textes.
+
+    Returns:
+        DataFrame avec une ligne par (segment, paire d'annotateurs, champ)
+    """
+    pairs = []
+    for audio_path, by_user in group_annotations_by_segment(annotations).items():
+        title = audio_path.split("/")[-2] if "/" in audio_path else audio_path
+        for user_a, user_b in combinations(sorted(by_user), 2):
+            for field in AGREEMENT_FIELDS:
+                pairs.append({
+                    "title": title,
+                    "audio_path": audio_path,
+                    "user_a": user_a,
+                    "user_b": user_b,
+                    "field": field,
+                    "text_a": normalize_text(by_user[user_a].get(field)),
+                    "text_b": normalize_text(by_user[user_b].get(field)),
+                })
+
+    columns = ["title", "audio_path", "user_a", "user_b", "field", "cer", "wer"]
+    if not pairs:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.DataFrame(pairs)
+    texts = df["text_a"].tolist() + df["text_b"].tolist()
+    for metric, tokenize in (("cer", False), ("wer", True)):
+        encoded = _encode(texts, tokenize)
+        seqs_a, seqs_b = encoded[:len(df)], encoded[len(df):]
+        distances = batched_edit_distance(seqs_a, seqs_b)
+        mean_lengths = np.array([(len(x) + len(y)) / 2.0 for x, y in zip(seqs_a, seqs_b)])
+        df[metric] = distances / np.maximum(mean_lengths, 1.0)
+    return df[columns]
+
+
+def calculate_agreement_by_user(pairwise_df):
+    """Calcule le CER/WER moyen de chaque annotateur face aux autres, par champ."""
+    if pairwise_df.empty:
+        return pd.DataFrame(columns=["user", "field", "cer", "wer", "pairs"])
+    both_sides = pd.concat([
+        pairwise_df.rename(columns={"user_a": "user"}),
+        pairwise_df.rename(columns={"user_b": "user"}),
+    ])
+    return (both_sides.groupby(["user", "field"])
+            .agg(cer=("cer", "mean"), wer=("wer", "mean"), pairs=("cer", "size"))
+            .reset_index())
+
+
+def calculate_agreement_by_title(pairwise_df):
+    """Calcule le CER/WER moyen entre annotateurs pour chaque titre, par champ."""
+    if pairwise_df.empty:
+        return pd.DataFrame(columns=["title", "field", "cer", "wer", "pairs"])
+    return (pairwise_df.groupby(["title", "field"])
+            .agg(cer=("cer", "mean"), wer=("wer", "mean"), pairs=("cer", "size"))
+            .reset_index())
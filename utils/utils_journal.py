@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+JOURNAL_PATH = os.getenv("ANNOTATION_JOURNAL_PATH", "annotations_journal.jsonl")
+FLUSH_INTERVAL_SECONDS = float(os.getenv("ANNOTATION_FLUSH_INTERVAL", "5"))
+FLUSH_BATCH_SIZE = int(os.getenv("ANNOTATION_FLUSH_BATCH_SIZE", "50"))
+MAX_BACKOFF_SECONDS = 300.0
+# Au-delà, l'annotation est mise de côté dans le fichier des rejets au lieu d'être retentée indéfiniment
+MAX_ATTEMPTS = int(os.getenv("ANNOTATION_MAX_ATTEMPTS", "20"))
+
+_journal_lock = threading.Lock()
+_worker_lock = threading.Lock()
+_wake_event = threading.Event()
+_worker_thread = None
+
+
+def _read_entries(journal_path):
+    """Lit les entrées du journal (une entrée JSON par ligne)."""
+    if not os.path.exists(journal_path):
+        return []
+    entries = []
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Ligne tronquée par un arrêt brutal pendant l'écriture : on l'ignore.
+                print(f"Entrée de journal illisible ignorée: {line[:80]}")
+    return entries
+
+
+def _rewrite_entries(journal_path, entries):
+    """Réécrit le journal de manière atomique (fichier temporaire puis remplacement)."""
+    tmp_path = f"{journal_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, journal_path)
+
+
+def dead_letter_path(journal_path=JOURNAL_PATH):
+    """Chemin du fichier des annotations abandonnées, à côté du journal."""
+    return f"{os.path.splitext(journal_path)[0]}.dead.jsonl"
+
+
+def _append_entries(path, entries):
+    with open(path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def append_to_journal(payload, journal_path=JOURNAL_PATH):
+    """Ajoute une annotation au journal local et la rend durable sur disque."""
+    entry = {"id": uuid.uuid4().hex, "attempts": 0, "next_attempt_at": 0.0, "payload": payload}
+    with _journal_lock:
+        _append_entries(journal_path, [entry])
+    _wake_event.set()
+    return entry["id"]
+
+
+def load_pending_annotations(journal_path=JOURNAL_PATH):
+    """Renvoie les annotations du journal qui n'ont pas encore été envoyées."""
+    with _journal_lock:
+        return [entry["payload"] for entry in _read_entries(journal_path)]
+
+
+def flush_journal(upload_fn, batch_size=FLUSH_BATCH_SIZE, journal_path=JOURNAL_PATH):
+    """
+    Envoie un lot d'annotations du journal via `upload_fn`.
+
+    Les entrées envoyées avec succès sont retirées du journal ; les autres y restent
+    avec un délai de nouvelle tentative croissant. Après MAX_ATTEMPTS échecs, une entrée
+    est déplacée dans le fichier des rejets (voir dead_letter_path).
+
+    Returns:
+        Nombre d'annotations envoyées
+    """
+    now = time.time()
+    with _journal_lock:
+        batch = [e for e in _read_entries(journal_path) if e.get("next_attempt_at", 0.0) <= now][:batch_size]
+    if not batch:
+        return 0
+
+    # L'envoi se fait hors du verrou pour ne pas bloquer les nouvelles soumissions.
+    done, failed = set(), {}
+    for entry in batch:
+        try:
+            upload_fn(entry["payload"])
+            done.add(entry["id"])
+        except Exception as e:
+            attempts = entry.get("attempts", 0) + 1
+            delay = min(MAX_BACKOFF_SECONDS, 2.0 ** attempts)
+            failed[entry["id"]] = (attempts, time.time() + delay, str(e))
+            print(f"Erreur lors de l'envoi de {entry['payload'].get('audio_path')} (tentative {attempts}): {e}")
+
+    with _journal_lock:
+        remaining, dead = [], []
+        for entry in _read_entries(journal_path):
+            if entry["id"] in done:
+                continue
+            if entry["id"] in failed:
+                entry["attempts"], entry["next_attempt_at"], error = failed[entry["id"]]
+                if entry["attempts"] >= MAX_ATTEMPTS:
+                    entry["error"] = error
+                    dead.append(entry)
+                    continue
+            remaining.append(entry)
+        if dead:
+            # Les rejets sont écrits avant de retirer les entrées du journal : rien n'est perdu
+            _append_entries(dead_letter_path(journal_path), dead)
+            for entry in dead:
+                print(f"Annotation abandonnée après {entry['attempts']} tentatives: {entry['payload'].get('audio_path')}")
+        _rewrite_entries(journal_path, remaining)
+    return len(done)
+
+
+def _worker_loop(upload_fn, journal_path):
+    while True:
+        _wake_event.wait(FLUSH_INTERVAL_SECONDS)
+        _wake_event.clear()
+        try:
+            # On vide le journal lot par lot tant qu'il reste des entrées prêtes.
+            while flush_journal(upload_fn, journal_path=journal_path):
+                pass
+        except Exception as e:
+            print(f"Erreur dans le worker du journal d'annotations: {e}")
+
+
+def start_journal_worker(upload_fn, journal_path=JOURNAL_PATH):
+    """Démarre (une seule fois par processus) le thread qui vide le journal vers S3."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return _worker_thread
+        _worker_thread = threading.Thread(
+            target=_worker_loop,
+            args=(upload_fn, journal_path),
+            name="annotation-journal-worker",
+            daemon=True,
+        )
+        _worker_thread.start()
+        # Vider immédiatement ce qui reste d'une exécution précédente.
+        _wake_event.set()
+        return _worker_thread
@@ -0,0 +1,133 @@
+import re
+import unicodedata
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+MOORE_ALPHABET = ["a", "ã", "b", "d", "e", "ẽ", "ɛ", "f", "g", "h", "i", "ĩ", "ɩ", "k", "l", "m", "n", "o", "õ", "p", "r", "s", "t", "u", "ũ", "ʋ", "v", "w", "y", "z"]
+SPECIAL_TAGS = ["#rires", "#pleurs", "#MUSIQUE", "#BRUIT", "#silence"]
+# Caractères acceptés en plus des lettres de l'alphabet
+ALLOWED_SYMBOLS = " \t\n.,;:!?'’\"«»()-…0123456789"
+
+
+def normalize(text):
+    """Normalise un texte en NFC (ẽ, ĩ, ũ saisis en deux caractères deviennent un seul)."""
+    return unicodedata.normalize("NFC", str(text or ""))
+
+
+class MooreOrthography:
+    """
+    Validateur d'orthographe mooré, compilé une seule fois à partir de l'alphabet
+    et des balises de sons non verbaux.
+
+    Les balises inconnues sont des erreurs ; les caractères hors alphabet (noms propres,
+    emprunts comme « Macron » ou « Covid ») ne sont que signalés, l'annotateur peut confirmer.
+    """
+
+    def __init__(self, alphabet, tags, allowed_symbols=ALLOWED_SYMBOLS):
+        self.alphabet = [normalize(letter) for letter in alphabet]
+        self.tags = list(tags)
+        # Les balises sont reconnues quelle que soit la casse (#Musique = #MUSIQUE)
+        self.canonical_tags = {tag.lower(): tag for tag in self.tags}
+        self.tag_pattern = re.compile(
+            "(?:" + "|".join(re.escape(tag) for tag in sorted(self.tags, key=len, reverse=True)) + r")(?!\w)",
+            re.IGNORECASE,
+        )
+        self.any_tag_pattern = re.compile(r"#\w+")
+        allowed = set("".join(self.alphabet)) | set(allowed_symbols)
+        self.invalid_char_pattern = re.compile(f"[^{re.escape(''.join(sorted(allowed)))}]")
+        self.word_pattern = re.compile(f"[{re.escape(''.join(self.alphabet))}]+(?:['’-][{re.escape(''.join(self.alphabet))}]+)*")
+        self.allowed_codes = np.array(sorted(ord(c) for c in allowed), dtype=np.uint32)
+        self.alphabet_codes = np.array([ord(c) for c in self.alphabet], dtype=np.uint32)
+
+    def _strip_tags(self, text):
+        return self.tag_pattern.sub(" ", text)
+
+    def validate(self, text):
+        """
+        Vérifie les balises d'une transcription.
+
+        Returns:
+            Liste des erreurs bloquantes (vide si la transcription est valide)
+        """
+        text = normalize(text)
+        unknown_tags = sorted(set(self.any_tag_pattern.findall(self._strip_tags(text))))
+        if unknown_tags:
+            return [f"Balises inconnues: {', '.join(unknown_tags)} (attendues: {', '.join(self.tags)})"]
+        return []
+
+    def warnings(self, text):
+        """
+        Signale les caractères hors de l'alphabet mooré d'une transcription.
+
+        Returns:
+            Liste des avertissements, que l'annotateur peut confirmer (vide si rien à signaler)
+        """
+        untagged = self.any_tag_pattern.sub(" ", self._strip_tags(normalize(text))).lower()
+        invalid_chars = sorted(set(self.invalid_char_pattern.findall(untagged)))
+        if invalid_chars:
+            return [f"Caractères hors de l'alphabet mooré: {' '.join(invalid_chars)}"]
+        return []
+
+    def corpus_statistics(self, texts):
+        """
+        Calcule les statistiques orthographiques d'un ensemble de transcriptions.
+
+        Tout le corpus est traité comme une seule chaîne : les balises et les mots sont
+        extraits par expressions régulières, les caractères comptés avec NumPy.
+
+        Returns:
+            Dictionnaire avec la couverture de l'alphabet, les caractères hors alphabet,
+            la fréquence des balises, la taille du vocabulaire et le nombre de textes invalides
+        """
+        texts = [normalize(t) for t in texts]
+        corpus = "\n".join(texts)
+        tag_counts = Counter(self.canonical_tags.get(tag.lower(), tag) for tag in self.any_tag_pattern.findall(corpus))
+        untagged = self.any_tag_pattern.sub(" ", corpus).lower()
+
+        codes = np.frombuffer(untagged.encode("utf-32-le"), dtype=np.uint32)
+        unique_codes, counts = np.unique(codes, return_counts=True)
+        in_alphabet = np.isin(unique_codes, self.alphabet_codes)
+        out_of_alphabet = ~np.isin(unique_codes, self.allowed_codes)
+
+        letter_counts = dict(zip(unique_codes[in_alphabet].tolist(), counts[in_alphabet].tolist()))
+        coverage = pd.DataFrame({
+            "lettre": self.alphabet,
+            "occurrences": [letter_counts.get(ord(c), 0) for c in self.alphabet],
+        })
+        invalid_chars = pd.DataFrame({
+            "caractère": [chr(c) for c in unique_codes[out_of_alphabet]],
+            "occurrences": counts[out_of_alphabet],
+        }).sort_values("occurrences", ascending=False)
+        tags = pd.DataFrame(
+            [(tag, tag_counts.get(tag, 0), tag in self.tags) for tag in self.tags + sorted(set(tag_counts) - set(self.tags))],
+            columns=["balise", "occurrences", "connue"],
+        )
+        vocabulary = Counter(self.word_pattern.findall(untagged))
+
+        return {
+            "coverage": coverage,
+            "invalid_chars": invalid_chars,
+            "tags": tags,
+            "vocabulary_size": len(vocabulary),
+            "total_words": sum(vocabulary.values()),
+            "invalid_texts": sum(1 for t in texts if self.invalid_char_pattern.search(self.any_tag_pattern.sub(" ", t).lower())),
+        }
+
+
+orthography = MooreOrthography(MOORE_ALPHABET, SPECIAL_TAGS)
+
+
+def validate_transcription(text):
+    """Vérifie qu'une transcription n'utilise que les balises attendues (erreurs bloquantes)."""
+    return orthography.validate(text)
+
+
+def transcription_warnings(text):
+    """Signale les caractères d'une transcription hors de l'alphabet mooré."""
+    return orthography.warnings(text)
+
+
+def calculate_orthography_statistics(annotations):
+    """Calcule les statistiques orthographiques des transcriptions d'un ensemble d'annotations."""
+    return orthography.corpus_statistics(ann.get("transcription", "") for ann in annotations)
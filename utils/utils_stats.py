@@ -1,4 +1,3 @@
-import boto3
 import json
 import os
 from collections import defaultdict
@@ -6,38 +5,90 @@ from datetime import datetime
 import pandas as pd
 import plotly.express as px
 from dotenv import load_dotenv
+from utils.utils_storage import storage
 
 load_dotenv(".env")
-S3_BUCKET = os.getenv("S3_BUCKET")
 ANNOTATIONS_PREFIX = "annotations"
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL_S3")
-
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    endpoint_url=ENDPOINT_URL
-)
+# Toutes les annotations regroupées dans un seul fichier JSONL (une annotation par ligne)
+COMPACTED_ANNOTATIONS_KEY = "compacted/annotations.jsonl"
 
 def load_all_annotations():
-    """Charge toutes les annotations depuis S3."""
+    """Charge toutes les annotations depuis le stockage."""
     annotations = []
-    paginator = s3.get_paginator("list_objects_v2")
-    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=ANNOTATIONS_PREFIX):
-        for obj in page.get("Contents", []):
-            key = obj["Key"]
-            if key.endswith(".json"):
-                try:
-                    file_obj = s3.get_object(Bucket=S3_BUCKET, Key=key)
-                    content = file_obj["Body"].read().decode('utf-8')
-                    data = json.loads(content)
-                    annotations.append(data)
-                except Exception as e:
-                    print(f"Erreur lors de la lecture de {key}: {e}")
+    for key in storage.list_keys(ANNOTATIONS_PREFIX):
+        if key.endswith(".json"):
+            try:
+                content = storage.get_bytes(key).decode('utf-8')
+                data = json.loads(content)
+                annotations.append(data)
+            except Exception as e:
+                print(f"Erreur lors de la lecture de {key}: {e}")
     return annotations
 
+def _read_compacted_annotations():
+    """Lit le fichier compacté : {clé: (version, annotation)}."""
+    compacted = {}
+    try:
+        content = storage.get_bytes(COMPACTED_ANNOTATIONS_KEY).decode('utf-8')
+    except Exception as e:
+        print(f"Fichier compacté indisponible, lecture complète des annotations: {e}")
+        return compacted
+    for line in content.splitlines():
+        if line.strip():
+            record = json.loads(line)
+            compacted[record["key"]] = (record.get("version"), record["annotation"])
+    return compacted
+
+def _reconcile_annotations(compacted):
+    """
+    Met à jour les annotations compactées à partir du listing du stockage : les
+    annotations nouvelles ou réécrites (version différente) sont relues, celles qui
+    n'existent plus sont retirées.
+
+    Returns:
+        Tuple (annotations par clé avec leur version, True si quelque chose a changé)
+    """
+    current = {}
+    changed = False
+    for key, version in storage.list_objects(ANNOTATIONS_PREFIX + "/"):
+        if not key.endswith(".json"):
+            continue
+        cached = compacted.get(key)
+        if cached is not None and cached[0] == version:
+            current[key] = cached
+            continue
+        try:
+            current[key] = (version, json.loads(storage.get_bytes(key).decode('utf-8')))
+            changed = True
+        except Exception as e:
+            print(f"Erreur lors de la lecture de {key}: {e}")
+    changed = changed or len(current) != len(compacted)
+    return current, changed
+
+def load_compacted_annotations():
+    """
+    Charge les annotations depuis le fichier compacté, en ne relisant individuellement
+    que les annotations ajoutées ou modifiées depuis la dernière compaction.
+    Le fichier compacté n'est pas réécrit (voir compact_annotations).
+    """
+    current, _ = _reconcile_annotations(_read_compacted_annotations())
+    return [annotation for _, annotation in current.values()]
+
+def compact_annotations():
+    """
+    Réécrit le fichier compacté à partir de l'état actuel des annotations.
+    À lancer périodiquement : python -m utils.utils_stats
+
+    Returns:
+        Nombre d'annotations compactées
+    """
+    current, changed = _reconcile_annotations(_read_compacted_annotations())
+    if changed:
+        lines = [json.dumps({"key": key, "version": version, "annotation": annotation}, ensure_ascii=False)
+                 for key, (version, annotation) in current.items()]
+        storage.put_bytes(COMPACTED_ANNOTATIONS_KEY, "\n".join(lines).encode('utf-8'), content_type="application/x-ndjson")
+    return len(current)
+
 def calculate_total_duration(annotations):
     """Calcule la durée totale des audios annotés (en minutes)."""
     total_seconds = sum(float(ann.get("duration", 0)) for ann in annotations)
@@ -129,4 +180,7 @@ def calculate_average_annotation_length(annotations):
     num_annotations = len(annotations)
     if num_annotations > 0:
         return total_duration / num_annotations / 60.0  # en minutes
-    return 0.0
\ No newline at end of file
+    return 0.0
+
+if __name__ == "__main__":
+    print(f"{compact_annotations()} annotations compactées dans {COMPACTED_ANNOTATIONS_KEY}")
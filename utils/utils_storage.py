@@ -0,0 +1,273 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3")  # "s3", "local" ou "cached"
+S3_BUCKET = os.getenv("S3_BUCKET")
+AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL_S3")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "data")
+CACHE_DIR = os.getenv("STORAGE_CACHE_DIR", ".audio_cache")
+CACHE_MAX_BYTES = int(float(os.getenv("STORAGE_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+# Seuls les objets immuables (segments audio) passent par le cache disque
+CACHED_EXTENSIONS = (".wav",)
+# Préfixe des fichiers temporaires d'écriture, ignorés au listage
+TMP_PREFIX = ".tmp-"
+
+
+class S3Storage:
+    """Stockage des objets dans un bucket S3."""
+
+    def __init__(self, bucket, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client(
+                "s3",
+                aws_access_key_id=AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                endpoint_url=ENDPOINT_URL
+            )
+        self.bucket = bucket
+        self.client = client
+
+    def list_keys(self, prefix=""):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix or ""):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+    def list_objects(self, prefix=""):
+        """Liste les objets avec leur version (ETag) pour détecter les réécritures."""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix or ""):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["ETag"].strip('"')
+
+    def get_bytes(self, key, length=None):
+        """Lit l'objet, ou seulement ses `length` premiers octets."""
+        params = {"Bucket": self.bucket, "Key": key}
+        if length:
+            params["Range"] = f"bytes=0-{length - 1}"
+        return self.client.get_object(**params)["Body"].read()
+
+    def put_bytes(self, key, data, content_type=None):
+        params = {"Bucket": self.bucket, "Key": key, "Body": data}
+        if content_type:
+            params["ContentType"] = content_type
+        self.client.put_object(**params)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception:
+            return False
+
+    def get_url(self, key, expires_in=3600):
+        """Génère une URL temporaire pour lire l'objet."""
+        return self.client.generate_presigned_url(
+            ClientMethod="get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires_in,
+        )
+
+
+class LocalStorage:
+    """Stockage des objets dans un répertoire local (clés = chemins relatifs)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def list_keys(self, prefix=""):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith(TMP_PREFIX):
+                    continue
+                relative = os.path.relpath(os.path.join(dirpath, filename), self.root)
+                key = relative.replace(os.sep, "/")
+                if key.startswith(prefix or ""):
+                    yield key
+
+    def list_objects(self, prefix=""):
+        """Liste les fichiers avec leur version (date de modification et taille)."""
+        for key in self.list_keys(prefix):
+            stat = os.stat(self._path(key))
+            yield key, f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def get_bytes(self, key, length=None):
+        with open(self._path(key), "rb") as f:
+            return f.read(length) if length else f.read()
+
+    def put_bytes(self, key, data, content_type=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Fichier temporaire propre à chaque écriture : des écritures concurrentes de la
+        # même clé ne se marchent pas dessus, la dernière remplace atomiquement les autres
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=TMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def get_url(self, key, expires_in=3600):
+        """Renvoie le chemin local du fichier (accepté par st.audio)."""
+        return self._path(key)
+
+
+class CachedStorage:
+    """
+    Cache disque LRU borné en taille devant un autre stockage (typiquement S3).
+
+    Les lectures des segments audio passent par le cache : les segments sur lesquels
+    travaillent plusieurs annotateurs sont servis depuis le disque local.
+    """
+
+    def __init__(self, backend, cache_dir, max_bytes):
+        self.backend = backend
+        self.cache = LocalStorage(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        # Téléchargements en cours : un seul thread télécharge une clé absente, les autres l'attendent
+        self._in_flight = {}
+
+        # Reprendre le contenu du cache existant, du moins au plus récemment utilisé
+        existing = []
+        for key in self.cache.list_keys():
+            path = self.cache._path(key)
+            stat = os.stat(path)
+            existing.append((stat.st_atime, key, stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _is_cacheable(self, key):
+        return key.endswith(CACHED_EXTENSIONS)
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self.cache._path(key))
+            except OSError:
+                pass
+
+    def _touch(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._entries.move_to_end(key)
+        # L'heure d'accès sert à reconstruire l'ordre LRU au redémarrage
+        try:
+            os.utime(self.cache._path(key))
+        except OSError:
+            pass
+        return True
+
+    def _store(self, key, data):
+        self.cache.put_bytes(key, data)
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _ensure_cached(self, key):
+        """
+        Garantit que la clé est dans le cache disque.
+
+        Returns:
+            Les octets de l'objet s'ils viennent d'être téléchargés par ce thread, sinon None
+        """
+        while True:
+            if self._touch(key) and self.cache.exists(key):
+                return None
+            with self._lock:
+                event = self._in_flight.get(key)
+                if event is None:
+                    event = self._in_flight[key] = threading.Event()
+                    break
+            # Un autre thread télécharge déjà cette clé ; s'il échoue, un des threads en attente reprend
+            event.wait()
+        try:
+            data = self.backend.get_bytes(key)
+            self._store(key, data)
+            return data
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            event.set()
+
+    def list_keys(self, prefix=""):
+        return self.backend.list_keys(prefix)
+
+    def list_objects(self, prefix=""):
+        return self.backend.list_objects(prefix)
+
+    def get_bytes(self, key, length=None):
+        if not self._is_cacheable(key):
+            return self.backend.get_bytes(key, length)
+        if self._touch(key):
+            try:
+                return self.cache.get_bytes(key, length)
+            except OSError:
+                pass
+        if length:
+            # Lecture partielle (en-tête) : rien n'est mis en cache
+            return self.backend.get_bytes(key, length)
+        data = self._ensure_cached(key)
+        if data is not None:
+            return data
+        try:
+            return self.cache.get_bytes(key)
+        except OSError:
+            # Évincé entre-temps
+            return self.backend.get_bytes(key)
+
+    def put_bytes(self, key, data, content_type=None):
+        self.backend.put_bytes(key, data, content_type)
+        if self._is_cacheable(key):
+            self._store(key, data)
+
+    def exists(self, key):
+        return self._touch(key) or self.backend.exists(key)
+
+    def get_url(self, key, expires_in=3600):
+        """Renvoie le chemin local du segment, téléchargé dans le cache si nécessaire."""
+        if not self._is_cacheable(key):
+            return self.backend.get_url(key, expires_in)
+        self._ensure_cached(key)
+        return self.cache.get_url(key)
+
+
+def create_storage(backend=STORAGE_BACKEND):
+    """Crée le stockage configuré par la variable d'environnement STORAGE_BACKEND."""
+    if backend == "local":
+        return LocalStorage(LOCAL_STORAGE_DIR)
+    if backend == "cached":
+        return CachedStorage(S3Storage(S3_BUCKET), CACHE_DIR, CACHE_MAX_BYTES)
+    if backend == "s3":
+        return S3Storage(S3_BUCKET)
+    raise ValueError(f"Backend de stockage inconnu: {backend}")
+
+
+storage = create_storage()
@@ -1,40 +1,39 @@
 
-import boto3
 import json
 import os
+import threading
+import time
+import wave
 from dotenv import load_dotenv
 import pandas as pd
 from io import BytesIO
 import soundfile as sf
 from datetime import datetime
+from collections import OrderedDict
+from utils.utils_journal import append_to_journal, load_pending_annotations, start_journal_worker
+from utils.utils_storage import storage, S3_BUCKET
+from utils.utils_orthography import validate_transcription, transcription_warnings
 
 
 from dotenv import load_dotenv
 load_dotenv(".env")
-S3_BUCKET = os.getenv("S3_BUCKET")
 S3_PREFIX = os.getenv("S3_PREFIX")
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL_S3")
 ANNOTATIONS_PREFIX = "annotations"
+# Soumission différée : l'annotation est écrite dans un journal local puis envoyée vers le stockage en arrière-plan.
+WRITE_BEHIND = os.getenv("ANNOTATION_WRITE_BEHIND", "0") == "1"
+# Fichier de métadonnées produit par le pipeline à côté des segments de chaque titre
+SEGMENT_METADATA_FILENAME = "metadata.json"
+# Métadonnées gardées en mémoire (titres), et délai avant de réessayer un titre sans métadonnées
+TITLE_METADATA_CACHE_SIZE = 256
+MISSING_METADATA_RETRY_SECONDS = 60
+# Octets lus pour obtenir la durée d'un segment depuis son en-tête WAV
+WAV_HEADER_BYTES = 4096
 
 
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    endpoint_url=ENDPOINT_URL
-)
-
 def list_audio_files_by_title():
     """Regroupe les fichiers audio par titre (préfixe de dossier)."""
-    response = s3.list_objects_v2(Bucket=S3_BUCKET, Prefix=S3_PREFIX)
-    if "Contents" not in response:
-        return {}
-
     grouped = {}
-    for obj in response["Contents"]:
-        key = obj["Key"]
+    for key in storage.list_keys(S3_PREFIX):
         if not key.endswith(".wav"):
             continue
         parts = key.split("/")
@@ -44,18 +43,13 @@ def list_audio_files_by_title():
     return grouped
 
 def get_audio_url(audio_path):
-    """Génère une URL temporaire pour écouter l'audio."""
-    return s3.generate_presigned_url(
-        ClientMethod="get_object",
-        Params={"Bucket": S3_BUCKET, "Key": audio_path},
-        ExpiresIn=3600,
-    )
+    """Génère une URL temporaire (ou un chemin local) pour écouter l'audio."""
+    return storage.get_url(audio_path, expires_in=3600)
 
-def get_audio_duration_from_s3(bucket, key):
-    """Récupère la durée d'un fichier audio depuis S3."""
+def get_audio_duration(key):
+    """Récupère la durée d'un fichier audio depuis le stockage."""
     try:
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        audio_bytes = obj['Body'].read()
+        audio_bytes = storage.get_bytes(key)
         with BytesIO(audio_bytes) as audio_buffer:
             y, sr = sf.read(audio_buffer)
             duration = len(y) / sr
@@ -64,13 +58,100 @@ def get_audio_duration_from_s3(bucket, key):
         print(f"Erreur lors de la lecture de la durée de {key}: {e}")
         return 0.0
 
-def save_annotation(audio_path, user, transcription, traduction):
-    """Sauvegarde l'annotation de l'utilisateur dans S3."""
-    duration = get_audio_duration_from_s3(S3_BUCKET, audio_path)
+def get_audio_duration_from_s3(bucket, key):
+    """Ancien nom de get_audio_duration ; le bucket est désormais celui du stockage configuré."""
+    return get_audio_duration(key)
+
+def get_audio_duration_from_header(key):
+    """Lit la durée d'un segment WAV à partir de son en-tête, sans télécharger l'audio."""
+    header = storage.get_bytes(key, length=WAV_HEADER_BYTES)
+    with wave.open(BytesIO(header), "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+def get_annotation_key(audio_path, user):
+    """Construit la clé de stockage de l'annotation d'un utilisateur pour un audio."""
     base_filename = os.path.basename(audio_path).replace(".wav", "")
     path_parts = audio_path.split('/')
     title = path_parts[-2]
-    annotation_key = f"{ANNOTATIONS_PREFIX}/{title}/{base_filename}__{user}.json"
+    return f"{ANNOTATIONS_PREFIX}/{title}/{base_filename}__{user}.json"
+
+def put_annotation(payload):
+    """Enregistre une annotation dans le stockage, en calculant sa durée si elle manque."""
+    if payload.get("duration") is None:
+        payload["duration"] = get_audio_duration(payload["audio_path"])
+
+    storage.put_bytes(
+        get_annotation_key(payload["audio_path"], payload["user"]),
+        json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        content_type="application/json",
+    )
+
+def start_annotation_worker():
+    """Démarre l'envoi en arrière-plan des annotations en attente dans le journal."""
+    return start_journal_worker(put_annotation)
+
+# Titre -> (instant d'expiration, métadonnées) ; un titre sans métadonnées n'est retenu que peu de temps
+_title_metadata_cache = OrderedDict()
+_title_metadata_lock = threading.Lock()
+
+def load_title_metadata(title_prefix):
+    """Charge les métadonnées des segments d'un titre (durée, niveaux, proportion de parole)."""
+    with _title_metadata_lock:
+        cached = _title_metadata_cache.get(title_prefix)
+        if cached is not None and cached[0] > time.monotonic():
+            _title_metadata_cache.move_to_end(title_prefix)
+            return cached[1]
+
+    key = f"{title_prefix}/{SEGMENT_METADATA_FILENAME}"
+    try:
+        metadata = json.loads(storage.get_bytes(key).decode("utf-8"))
+        expires_at = float("inf")
+    except Exception as e:
+        print(f"Métadonnées indisponibles pour {title_prefix}: {e}")
+        metadata = {}
+        expires_at = time.monotonic() + MISSING_METADATA_RETRY_SECONDS
+
+    with _title_metadata_lock:
+        _title_metadata_cache[title_prefix] = (expires_at, metadata)
+        _title_metadata_cache.move_to_end(title_prefix)
+        while len(_title_metadata_cache) > TITLE_METADATA_CACHE_SIZE:
+            _title_metadata_cache.popitem(last=False)
+    return metadata
+
+def get_segment_metadata(audio_path):
+    """Renvoie les métadonnées d'un segment, ou un dictionnaire vide si elles n'existent pas."""
+    title_prefix, filename = audio_path.rsplit("/", 1)
+    return load_title_metadata(title_prefix).get(filename, {})
+
+class OrthographyWarning(ValueError):
+    """Transcription hors de l'alphabet mooré, enregistrable une fois confirmée par l'annotateur."""
+
+
+def save_annotation(audio_path, user, transcription, traduction, write_behind=None, confirmed=False):
+    """
+    Sauvegarde l'annotation de l'utilisateur dans le stockage (ou dans le journal local en mode différé).
+
+    Lève une ValueError si la transcription contient des balises inconnues, et une
+    OrthographyWarning si elle contient des caractères hors alphabet sans que
+    l'annotateur l'ait confirmée (`confirmed`).
+    """
+    errors = validate_transcription(transcription)
+    if errors:
+        raise ValueError(" ; ".join(errors))
+    warnings = transcription_warnings(transcription)
+    if warnings and not confirmed:
+        raise OrthographyWarning(" ; ".join(warnings))
+
+    if write_behind is None:
+        write_behind = WRITE_BEHIND
+
+    duration = get_segment_metadata(audio_path).get("duration")
+    if duration is None:
+        # Titre découpé avant les fichiers de métadonnées : l'en-tête du WAV suffit
+        try:
+            duration = get_audio_duration_from_header(audio_path)
+        except Exception as e:
+            print(f"Durée indisponible dans l'en-tête de {audio_path}: {e}")
 
     payload = {
         "audio_path": audio_path,
@@ -82,33 +163,44 @@ def save_annotation(audio_path, user, transcription, traduction):
 
     }
 
-    s3.put_object(
-        Bucket=S3_BUCKET,
-        Key=annotation_key,
-        Body=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
-        ContentType="application/json",
-    )
+    if write_behind:
+        append_to_journal(payload)
+        start_annotation_worker()
+        return
+
+    put_annotation(payload)
+
+def get_pending_annotations_by_user(username: str, title: str = None) -> list:
+    """Renvoie les annotations d'un utilisateur encore en attente d'envoi dans le journal local."""
+    pending = []
+    for payload in load_pending_annotations():
+        if payload.get("user") != username:
+            continue
+        if title is not None and payload["audio_path"].split('/')[-2] != title:
+            continue
+        pending.append(payload)
+    return pending
 
 def get_total_audio_duration_by_user(username: str) -> float:
     """Calcule la durée totale (en minutes) d'audios annotés par un utilisateur."""
-    paginator = s3.get_paginator("list_objects_v2")
     total_seconds = 0.0
 
-    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=ANNOTATIONS_PREFIX):
-        for obj in page.get("Contents", []):
-            key = obj["Key"]
-            if not key.endswith(".json") or f"__{username}.json" not in key:
-                continue
-            try:
-                file_obj = s3.get_object(Bucket=S3_BUCKET, Key=key)
-                content = file_obj["Body"].read().decode('utf-8')
-                data = json.loads(content)
-                duration = data.get("duration")
-                if duration:
-                    total_seconds += float(duration)
-            except Exception as e:
-                print(f"Erreur lors de la lecture de {key}: {e}")
-                continue
+    for key in storage.list_keys(ANNOTATIONS_PREFIX):
+        if not key.endswith(".json") or f"__{username}.json" not in key:
+            continue
+        try:
+            content = storage.get_bytes(key).decode('utf-8')
+            data = json.loads(content)
+            duration = data.get("duration")
+            if duration:
+                total_seconds += float(duration)
+        except Exception as e:
+            print(f"Erreur lors de la lecture de {key}: {e}")
+            continue
+
+    # Les soumissions encore dans le journal comptent aussi dans la progression.
+    for payload in get_pending_annotations_by_user(username):
+        total_seconds += float(payload.get("duration") or 0.0)
 
     return total_seconds / 60.0
 
@@ -116,11 +208,10 @@ def get_processed_audio_files_by_user_and_title(username: str, title: str) -> se
     """Récupère l'ensemble des noms de fichiers audio déjà traités par un utilisateur pour un titre donné."""
     processed_files = set()
     prefix = f"{ANNOTATIONS_PREFIX}/{title}/"
-    paginator = s3.get_paginator("list_objects_v2")
-    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix):
-        for obj in page.get("Contents", []):
-            key = obj["Key"]
-            if key.endswith(f"__{username}.json"):
-                filename_with_ext = key.split("/")[-1].replace(f"__{username}.json", ".wav")
-                processed_files.add(filename_with_ext)
+    for key in storage.list_keys(prefix):
+        if key.endswith(f"__{username}.json"):
+            filename_with_ext = key.split("/")[-1].replace(f"__{username}.json", ".wav")
+            processed_files.add(filename_with_ext)
+    for payload in get_pending_annotations_by_user(username, title):
+        processed_files.add(os.path.basename(payload["audio_path"]))
     return processed_files